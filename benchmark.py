@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for HRNZipper
+Measures create, list, test and extract throughput and peak memory for every
+supported output format on synthetic corpora, through the headless command line
+By Harun Softwares
+
+Usage:
+    python benchmark.py                          # run and save benchmark_results.json
+    python benchmark.py --scale 4 --output new.json
+    python benchmark.py --compare old.json       # run and print changes against old results
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from pathlib import Path
+
+FORMATS = ['zip', '7z', 'tar', 'tar.gz', 'tar.bz2']
+OPERATIONS = ['create', 'list', 'test', 'extract']
+
+MAIN_SCRIPT = Path(__file__).resolve().parent / 'main.py'
+
+# A headless command that only parses its arguments, timing it gives the
+# fixed interpreter and import cost included in every measurement
+BASELINE_COMMAND = ['list', '--help']
+BASELINE_RUNS = 5
+
+# Members in the archive whose listing memory is compared
+LISTING_ENTRIES = 200000
+
+WORDS = (
+    'def class return import self value archive file path data size index '
+    'for while if else try except with open read write compress extract '
+    'None True False list dict name level password entry folder buffer'
+).split()
+
+def write_small_files(root, rng, scale):
+    """Many small text files spread over nested folders"""
+    for i in range(2000 * scale):
+        folder = root / f'dir{i % 50:02d}' / f'sub{i % 7}'
+        folder.mkdir(parents=True, exist_ok=True)
+        words = rng.choices(WORDS, k=rng.randint(100, 600))
+        (folder / f'file{i:05d}.txt').write_text(' '.join(words))
+
+def write_huge_files(root, rng, scale):
+    """A few large files with mixed compressible content"""
+    block = ' '.join(rng.choices(WORDS, k=200_000)).encode()
+    for i in range(2):
+        with open(root / f'huge{i}.bin', 'wb') as f:
+            for _ in range(32 * scale):
+                # Half text, half random data in every MiB
+                f.write(block[:512 * 1024])
+                f.write(rng.randbytes(512 * 1024))
+
+def write_media_files(root, rng, scale):
+    """Incompressible files standing in for photos and videos"""
+    for i in range(40 * scale):
+        (root / f'photo{i:03d}.jpg').write_bytes(rng.randbytes(rng.randint(256, 1024) * 1024))
+
+def write_source_tree(root, rng, scale):
+    """Text-heavy source tree with repetitive code-like lines"""
+    for i in range(600 * scale):
+        package = root / f'pkg{i % 20:02d}'
+        package.mkdir(parents=True, exist_ok=True)
+        lines = []
+        for _ in range(rng.randint(50, 400)):
+            indent = '    ' * rng.randint(0, 3)
+            lines.append(indent + ' '.join(rng.choices(WORDS, k=rng.randint(3, 10))))
+        (package / f'module{i:04d}.py').write_text('\n'.join(lines))
+
+CORPORA = {
+    'small_files': write_small_files,
+    'huge_files': write_huge_files,
+    'media': write_media_files,
+    'source_tree': write_source_tree,
+}
+
+def generate_corpus(name, root, seed, scale):
+    """Generate a deterministic corpus and return its total size in bytes"""
+    root.mkdir(parents=True)
+    CORPORA[name](root, random.Random(f'{seed}-{name}'), scale)
+    return sum(path.stat().st_size for path in root.rglob('*') if path.is_file())
+
+def run_cli(args):
+    """Run one headless HRNZipper command, return (seconds, peak RSS in KiB, return code)"""
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, str(MAIN_SCRIPT)] + args,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr
+        )
+        # wait4 gives the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        
+        stderr.seek(0)
+        error = stderr.read().decode(errors='replace').strip()
+    
+    if process.returncode != 0 and error:
+        print(f"    {error.splitlines()[-1]}")
+    
+    # ru_maxrss is in KiB on Linux but in bytes on macOS
+    peak_rss_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return seconds, peak_rss_kb, process.returncode
+
+def measure_baseline():
+    """Return the median time and peak RSS of a no-op headless run"""
+    runs = [run_cli(BASELINE_COMMAND) for _ in range(BASELINE_RUNS)]
+    if any(returncode != 0 for _, _, returncode in runs):
+        raise RuntimeError(f"Baseline command failed: main.py {' '.join(BASELINE_COMMAND)}")
+    return {
+        'command': BASELINE_COMMAND,
+        'seconds': round(statistics.median(seconds for seconds, _, _ in runs), 4),
+        'peak_rss_kb': statistics.median(peak for _, peak, _ in runs),
+    }
+
+def retained_memory(load):
+    """Return the bytes allocated by load() that are still held by its result"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = load()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+def measure_listing_memory(entries, work_dir):
+    """Compare the memory held by a ZipInfo list and by a ZipListing of the same archive"""
+    from core.zip_listing import list_zip
+    
+    path = Path(work_dir) / 'listing.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(entries):
+            zf.writestr(f'folder{i % 100:03}/file{i:07}.txt', b'')
+    
+    def infolist():
+        with zipfile.ZipFile(path) as zf:
+            return zf.infolist()
+    
+    zipinfo_bytes = retained_memory(infolist)
+    zip_listing_bytes = retained_memory(lambda: list_zip(path))
+    path.unlink()
+    return {
+        'entries': entries,
+        'zipinfo_bytes': zipinfo_bytes,
+        'zip_listing_bytes': zip_listing_bytes,
+        'zipinfo_bytes_per_entry': round(zipinfo_bytes / entries, 1),
+        'zip_listing_bytes_per_entry': round(zip_listing_bytes / entries, 1),
+    }
+
+def benchmark_format(corpus_name, corpus_dir, corpus_bytes, archive_format, work_dir, baseline):
+    """Run every operation for one corpus and format"""
+    archive = work_dir / f'{corpus_name}.{archive_format}'
+    extract_dir = work_dir / f'{corpus_name}-{archive_format}-out'
+    commands = {
+        'create': ['create', str(archive), str(corpus_dir)],
+        'list': ['list', str(archive)],
+        'test': ['test', str(archive)],
+        'extract': ['extract', str(archive), str(extract_dir)],
+    }
+    
+    results = []
+    for operation in OPERATIONS:
+        seconds, peak_rss_kb, returncode = run_cli(commands[operation])
+        archive_size = archive.stat().st_size if archive.exists() else 0
+        ok = returncode == 0
+        # Throughput leaves out the startup cost every command pays
+        net_seconds = max(seconds - baseline['seconds'], 0)
+        result = {
+            'corpus': corpus_name,
+            'format': archive_format,
+            'operation': operation,
+            'ok': ok,
+            'seconds': round(seconds, 4),
+            'net_seconds': round(net_seconds, 4),
+            'input_bytes': corpus_bytes,
+            'archive_bytes': archive_size,
+            'ratio': round(archive_size / corpus_bytes, 4) if ok and corpus_bytes else None,
+            'throughput_mb_s': round(corpus_bytes / net_seconds / 1e6, 2) if ok and net_seconds else None,
+            'peak_rss_kb': peak_rss_kb,
+        }
+        results.append(result)
+        status = 'ok' if result['ok'] else f'FAILED ({returncode})'
+        print(f"  {archive_format:<8}{operation:<8}{seconds:8.2f} s"
+              f"{result['throughput_mb_s'] or 0:10.1f} MB/s{peak_rss_kb / 1024:8.1f} MiB  {status}")
+        
+        # Later operations need the archive, skip them if creating it failed
+        if operation == 'create' and not result['ok']:
+            break
+    
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    if archive.exists():
+        archive.unlink()
+    return results
+
+def get_label():
+    """Describe the benchmarked version, from git if available"""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=MAIN_SCRIPT.parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare_results(old, new):
+    """Print the time change of every measurement present in both result sets"""
+    def key(result):
+        return (result['corpus'], result['format'], result['operation'])
+    
+    def seconds(result):
+        # Older result files have no startup baseline
+        return result.get('net_seconds', result['seconds'])
+    
+    previous = {key(result): result for result in old['results'] if result['ok']}
+    print(f"\nChanges from {old['label']} to {new['label']} (negative is faster):")
+    for result in new['results']:
+        before = previous.get(key(result))
+        if not before or not result['ok'] or not seconds(before):
+            continue
+        change = (seconds(result) - seconds(before)) / seconds(before) * 100
+        memory = (result['peak_rss_kb'] - before['peak_rss_kb']) / 1024
+        print(f"  {result['corpus']:<12}{result['format']:<8}{result['operation']:<8}"
+              f"{change:+7.1f}% time{memory:+8.1f} MiB peak")
+
+def run_benchmarks(args):
+    """Generate the corpora and benchmark every format, return the result document"""
+    baseline = measure_baseline()
+    print(f"\nStartup baseline (main.py {' '.join(BASELINE_COMMAND)}): "
+          f"{baseline['seconds']:.2f} s{baseline['peak_rss_kb'] / 1024:8.1f} MiB")
+    
+    results = []
+    listing_memory = None
+    work_root = Path(tempfile.mkdtemp(prefix='hrnzipper-bench-', dir=args.work_dir))
+    try:
+        if args.listing_entries:
+            listing_memory = measure_listing_memory(args.listing_entries, work_root)
+            print(f"\nListing memory for {args.listing_entries} ZIP entries: "
+                  f"ZipInfo {listing_memory['zipinfo_bytes_per_entry']:.0f} B/entry, "
+                  f"ZipListing {listing_memory['zip_listing_bytes_per_entry']:.0f} B/entry")
+        for corpus_name in args.corpora:
+            corpus_dir = work_root / 'corpus' / corpus_name
+            corpus_bytes = generate_corpus(corpus_name, corpus_dir, args.seed, args.scale)
+            print(f"\n{corpus_name}: {corpus_bytes / 1e6:.1f} MB")
+            for archive_format in args.formats:
+                results.extend(benchmark_format(corpus_name, corpus_dir, corpus_bytes,
+                                                archive_format, work_root, baseline))
+            shutil.rmtree(corpus_dir)
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+    
+    return {
+        'label': args.label or get_label(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'scale': args.scale,
+        'startup_baseline': baseline,
+        'listing_memory': listing_memory,
+        'results': results,
+    }
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description='HRNZipper benchmark suite')
+    parser.add_argument('--output', default='benchmark_results.json', help='Result file to write')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    parser.add_argument('--label', help='Name of the benchmarked version (defaults to git describe)')
+    parser.add_argument('--scale', type=int, default=1, help='Corpus size multiplier')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the synthetic corpora')
+    parser.add_argument('--corpora', nargs='+', choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    parser.add_argument('--listing-entries', type=int, default=LISTING_ENTRIES,
+                        help='Members in the listing memory comparison, 0 skips it')
+    parser.add_argument('--work-dir', help='Folder for corpora and archives (defaults to the temp folder)')
+    args = parser.parse_args()
+    
+    if not hasattr(os, 'wait4'):
+        print("The benchmark suite needs os.wait4 and runs on Linux or macOS only")
+        return 1
+    
+    print("HRNZipper - Benchmark Suite")
+    print("=" * 40)
+    
+    report = run_benchmarks(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), report)
+    
+    failed = [result for result in report['results'] if not result['ok']]
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -71,6 +71,55 @@ exe = EXE(
     icon='resources/app_icon.ico',
     version='version_info.txt',
 )
+
+# Console build of the same entry point for batch scripts: cmd.exe waits for
+# it, and it has stdout/stderr for listings and errors. Qt is left out so the
+# one-file exe unpacks and starts quickly.
+cli_a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[
+        'cryptography',
+        'py7zr',
+        'rarfile',
+    ],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['PyQt5', 'PIL', 'psutil'],
+    win_no_prefer_redirects=False,
+    win_private_assemblies=False,
+    cipher=block_cipher,
+    noarchive=False,
+)
+
+cli_pyz = PYZ(cli_a.pure, cli_a.zipped_data, cipher=block_cipher)
+
+cli_exe = EXE(
+    cli_pyz,
+    cli_a.scripts,
+    cli_a.binaries,
+    cli_a.zipfiles,
+    cli_a.datas,
+    [],
+    name='HRNZipper-cli',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='resources/app_icon.ico',
+    version='version_info.txt',
+)
 '''
     
     with open('desktop_archiver.spec', 'w') as f:
@@ -193,9 +242,11 @@ def create_installer_package():
     package_dir = Path('package')
     package_dir.mkdir(exist_ok=True)
     
-    # Copy executable
+    # Copy executables
     if os.path.exists('dist/DesktopArchiver.exe'):
         shutil.copy2('dist/DesktopArchiver.exe', package_dir)
+    if os.path.exists('dist/HRNZipper-cli.exe'):
+        shutil.copy2('dist/HRNZipper-cli.exe', package_dir)
     
     # Create README for Windows
     readme_content = '''# Desktop Archiver v1.0
@@ -220,6 +271,7 @@ def create_installer_package():
 - Double-click archive files to open them
 - Right-click folders to compress them
 - Use the application interface for advanced operations
+- Batch scripts should call HRNZipper-cli.exe, e.g. HRNZipper-cli extract backup.zip output
 
 For support, visit: https://github.com/your-repo/desktop-archiver
 '''
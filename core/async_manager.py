@@ -0,0 +1,123 @@
+"""
+asyncio facade for HRNZipper archive operations
+Runs the blocking ArchiveManager calls in worker threads so services can
+await them without blocking the event loop
+
+This is executor wrapping, not a native async implementation: every call
+still occupies one thread for its whole duration, and a running operation
+cannot be interrupted. Cancelling an awaiting caller only stops the wait.
+"""
+
+import asyncio
+import threading
+import concurrent.futures
+
+# Entries handed from the listing thread to the event loop at a time, and
+# how many such batches may wait in the queue
+LIST_BATCH_SIZE = 1000
+LIST_QUEUE_BATCHES = 4
+
+def _default_manager_factory():
+    from core.archive_manager import ArchiveManager
+    return ArchiveManager()
+
+class AsyncArchiveManager:
+    """Awaitable wrapper around ArchiveManager
+    
+    Every job gets its own ArchiveManager from ``manager_factory`` and runs in
+    a worker thread. At most ``max_jobs`` jobs run at once, later callers wait
+    for a free slot, which gives the service natural backpressure.
+    """
+    
+    def __init__(self, max_jobs=4, manager_factory=None):
+        self.max_jobs = max_jobs
+        self.manager_factory = manager_factory or _default_manager_factory
+        self._slots = asyncio.Semaphore(max_jobs)
+    
+    async def _run(self, operation):
+        await self._slots.acquire()
+        try:
+            job = asyncio.ensure_future(asyncio.to_thread(lambda: operation(self.manager_factory())))
+        except BaseException:
+            self._slots.release()
+            raise
+        
+        # The worker thread keeps running when the caller is cancelled, so the
+        # slot is only released once the thread has finished
+        job.add_done_callback(self._release)
+        return await asyncio.shield(job)
+    
+    def _release(self, job):
+        self._slots.release()
+        if not job.cancelled():
+            # Mark the outcome as retrieved, a cancelled caller never awaits it
+            job.exception()
+    
+    async def acreate(self, archive_path, files, **options):
+        """Create an archive from the given files and folders"""
+        files = list(files)
+        return await self._run(lambda m: m.create_archive(archive_path, files, **options))
+    
+    async def aextract(self, archive_path, destination, **options):
+        """Extract an archive into the destination folder"""
+        return await self._run(lambda m: m.extract_archive(archive_path, destination, **options))
+    
+    async def atest(self, archive_path, **options):
+        """Test archive integrity"""
+        return await self._run(lambda m: m.test_archive(archive_path, **options))
+    
+    async def alist(self, archive_path, **options):
+        """Iterate over the archive entries
+        
+        Usage: ``async for entry in manager.alist(path): ...``
+        
+        The listing is read in the worker thread and handed over in batches
+        of ``LIST_BATCH_SIZE`` entries through a bounded queue, so entries
+        arrive while the archive is still being read and memory does not
+        grow with the archive size.
+        """
+        loop = asyncio.get_running_loop()
+        batches = asyncio.Queue(LIST_QUEUE_BATCHES)
+        stopped = threading.Event()
+        
+        def put(item):
+            # Block the worker thread while the queue is full, unless the
+            # consumer has gone away
+            future = asyncio.run_coroutine_threadsafe(batches.put(item), loop)
+            while not stopped.is_set():
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    continue
+            future.cancel()
+            return False
+        
+        def produce(manager):
+            batch = []
+            try:
+                for entry in manager.list_archive(archive_path, **options):
+                    batch.append(entry)
+                    if len(batch) >= LIST_BATCH_SIZE:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch:
+                    put(batch)
+            finally:
+                put(None)
+        
+        job = asyncio.ensure_future(self._run(produce))
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                for entry in batch:
+                    yield entry
+            # Raise any error the listing ended with
+            await job
+        finally:
+            stopped.set()
+            if not job.done():
+                job.add_done_callback(lambda done: done.cancelled() or done.exception())
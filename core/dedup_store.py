@@ -0,0 +1,235 @@
+"""
+Deduplicating archive format for HRNZipper
+Stores every distinct piece of content once, however many files or places
+within files it appears in
+
+Files are split with content-defined chunking: a cut is made where the last
+``CUT_BITS`` bytes, each mapped to one bit by a fixed table, form a fixed
+pattern. Cuts depend only on nearby content, so inserting data early in a
+file moves the cuts with it and the chunks after it still match. The
+mapping and the search run as bytes.translate and bytes.find, in C.
+
+Each distinct chunk, keyed by its SHA-256, is compressed once and written
+once. Files are lists of chunk numbers. Layout of a ``.hrnd`` file:
+
+    header   MAGIC, format version
+    chunks   zlib-compressed or stored chunk data, back to back
+    index    zlib-compressed JSON with the chunk table and the entries
+    trailer  MAGIC, index offset, index length
+"""
+
+import os
+import json
+import stat
+import zlib
+import struct
+import hashlib
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from core.zip_extract import safe_member_path
+from core.zip_writer import collect_inputs, compression_level_of, skip_path
+
+MAGIC = b'HRNDEDUP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sH')
+TRAILER = struct.Struct('<8sQQ')
+
+STORED = 0
+DEFLATED = 8
+
+# Average chunk size is MIN_CHUNK + 2 ** CUT_BITS
+CUT_BITS = 14
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 128 * 1024
+READ_SIZE = 4 * 1024 * 1024
+
+# Fixed for the format, changing them only lowers deduplication against
+# chunks written before
+BIT_TABLE = bytes(hashlib.sha256(bytes([value])).digest()[0] & 1 for value in range(256))
+CUT_PATTERN = bytes(hashlib.sha256(b'hrnzipper-cut').digest()[index] & 1 for index in range(CUT_BITS))
+
+class DedupStoreError(ValueError):
+    """Raised when a dedup archive is damaged or not a dedup archive"""
+
+def is_dedup_archive(path):
+    """Whether the file name has the dedup archive extension"""
+    return str(path).lower().endswith('.hrnd')
+
+def find_cut(data, start, end):
+    """Return where the chunk beginning at start ends, end being the last possible cut"""
+    if end - start <= MIN_CHUNK:
+        return end
+    search_start = start + MIN_CHUNK - CUT_BITS
+    bits = data[search_start:end].translate(BIT_TABLE)
+    found = bits.find(CUT_PATTERN)
+    return end if found < 0 else search_start + found + CUT_BITS
+
+def split_chunks(f):
+    """Yield the content-defined chunks of a binary file"""
+    buffer = b''
+    position = 0
+    eof = False
+    while True:
+        if not eof and len(buffer) - position < MAX_CHUNK:
+            data = f.read(READ_SIZE)
+            eof = not data
+            buffer = buffer[position:] + data
+            position = 0
+        if position >= len(buffer):
+            return
+        cut = find_cut(buffer, position, min(len(buffer), position + MAX_CHUNK))
+        yield buffer[position:cut]
+        position = cut
+
+def _compress_chunk(data, level):
+    """Return (method, stored bytes), keeping data that does not shrink as it is"""
+    if level:
+        compressed = zlib.compress(data, level)
+        if len(compressed) < len(data):
+            return DEFLATED, compressed
+    return STORED, data
+
+def create_store(archive_path, files, compression_level=None, workers=None):
+    """Create a dedup archive from the given files and folders
+
+    Only chunks not seen before in this archive are compressed and written.
+    Returns the number of entries written.
+    """
+    level = compression_level_of(compression_level)
+    workers = workers or os.cpu_count() or 1
+    window = workers * 4
+
+    archive_path = os.path.abspath(archive_path)
+    fd, temp_path = tempfile.mkstemp(prefix='.hrnzipper-', suffix='.tmp',
+                                     dir=os.path.dirname(archive_path))
+    try:
+        with os.fdopen(fd, 'wb') as f, ThreadPoolExecutor(workers) as executor:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION))
+            chunk_ids = {}
+            chunks = []
+            entries = []
+            pending = deque()
+
+            def write_done(limit):
+                # Chunks are written in the order they were first seen
+                while len(pending) > limit:
+                    size, digest, future = pending.popleft()
+                    method, data = future.result()
+                    chunks.append([f.tell(), len(data), size, method, digest])
+                    f.write(data)
+
+            for item in skip_path(collect_inputs(files), temp_path):
+                mtime_ns = item.stat.st_mtime_ns
+                mode = stat.S_IMODE(item.stat.st_mode)
+                if stat.S_ISDIR(item.stat.st_mode):
+                    entries.append([item.arcname, 'dir', mode, mtime_ns, 0, []])
+                    continue
+                refs = []
+                size = 0
+                with open(item.path, 'rb') as source:
+                    for data in split_chunks(source):
+                        digest = hashlib.sha256(data).hexdigest()
+                        chunk_id = chunk_ids.get(digest)
+                        if chunk_id is None:
+                            chunk_id = chunk_ids[digest] = len(chunk_ids)
+                            pending.append((len(data), digest,
+                                            executor.submit(_compress_chunk, data, level)))
+                            write_done(window)
+                        refs.append(chunk_id)
+                        size += len(data)
+                entries.append([item.arcname, 'file', mode, mtime_ns, size, refs])
+            write_done(0)
+
+            index = zlib.compress(json.dumps({
+                'version': FORMAT_VERSION, 'chunks': chunks, 'entries': entries,
+            }, separators=(',', ':')).encode('utf-8'))
+            index_offset = f.tell()
+            f.write(index)
+            f.write(TRAILER.pack(MAGIC, index_offset, len(index)))
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(entries)
+
+def read_index(f):
+    """Return the index of an open dedup archive"""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    if size < HEADER.size + TRAILER.size:
+        raise DedupStoreError("Not a dedup archive")
+    f.seek(0)
+    magic, version = HEADER.unpack(f.read(HEADER.size))
+    f.seek(size - TRAILER.size)
+    trailer_magic, index_offset, index_length = TRAILER.unpack(f.read(TRAILER.size))
+    if magic != MAGIC or trailer_magic != MAGIC:
+        raise DedupStoreError("Not a dedup archive")
+    if version != FORMAT_VERSION:
+        raise DedupStoreError(f"Unsupported dedup archive version {version}")
+    if index_offset + index_length > size - TRAILER.size:
+        raise DedupStoreError("Bad index offset")
+    f.seek(index_offset)
+    try:
+        return json.loads(zlib.decompress(f.read(index_length)))
+    except (zlib.error, ValueError) as e:
+        raise DedupStoreError(f"Damaged index: {e}")
+
+def _read_chunk(f, chunk):
+    """Return the data of one chunk, checking its size and hash"""
+    offset, length, size, method, digest = chunk
+    f.seek(offset)
+    data = f.read(length)
+    try:
+        if method == DEFLATED:
+            data = zlib.decompress(data)
+    except zlib.error as e:
+        raise DedupStoreError(f"Damaged chunk at offset {offset}: {e}")
+    if len(data) != size or hashlib.sha256(data).hexdigest() != digest:
+        raise DedupStoreError(f"Damaged chunk at offset {offset}")
+    return data
+
+def list_store(archive_path):
+    """Return the entry names of a dedup archive"""
+    with open(archive_path, 'rb') as f:
+        return [entry[0] for entry in read_index(f)['entries']]
+
+def extract_store(archive_path, destination):
+    """Extract every entry of a dedup archive, returns the number extracted"""
+    destination = os.path.abspath(destination)
+    with open(archive_path, 'rb') as f:
+        index = read_index(f)
+        chunks = index['chunks']
+        for name, kind, mode, mtime_ns, size, refs in index['entries']:
+            target = safe_member_path(destination, name)
+            if target is None:
+                continue
+            if kind == 'dir':
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as out:
+                for chunk_id in refs:
+                    out.write(_read_chunk(f, chunks[chunk_id]))
+            os.chmod(target, mode)
+            os.utime(target, ns=(mtime_ns, mtime_ns))
+    return len(index['entries'])
+
+def verify_store(archive_path):
+    """Check every chunk of a dedup archive, returns True if all of them are intact"""
+    try:
+        with open(archive_path, 'rb') as f:
+            index = read_index(f)
+            for chunk in index['chunks']:
+                _read_chunk(f, chunk)
+            sizes = [chunk[2] for chunk in index['chunks']]
+            for _, _, _, _, size, refs in index['entries']:
+                if sum(sizes[chunk_id] for chunk_id in refs) != size:
+                    return False
+    except (DedupStoreError, IndexError, TypeError, ValueError):
+        return False
+    return True
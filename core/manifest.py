@@ -0,0 +1,155 @@
+"""
+Incremental ZIP archiving for HRNZipper
+Archives only what changed since the previous run and restores chains of
+such archives
+
+Every incremental archive has a manifest next to it recording the path,
+size, modification time and SHA-256 of each input. The next run hashes only
+the files whose size or modification time differ, then archives the new
+and changed files. Files that disappeared are recorded as tombstones. The
+manifest also names the archive it builds on, so a restore walks the chain
+from the newest archive back to the full one and extracts every file from
+the newest archive that holds it.
+"""
+
+import os
+import stat
+import json
+import hashlib
+
+from core.zip_extract import extract_zip
+from core.zip_writer import collect_inputs, write_inputs
+
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ManifestError(ValueError):
+    """Raised when an archive's manifest or its chain of base archives is missing or invalid"""
+
+def manifest_path(archive_path):
+    """Return where the manifest of an archive is saved"""
+    return str(archive_path) + MANIFEST_SUFFIX
+
+def file_digest(path):
+    """Return the SHA-256 of a file as a hex string"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def build_entries(items, previous=None):
+    """Return {name: [size, mtime_ns, sha256]} for ZipInputs
+
+    Files whose size and modification time match the previous entries keep
+    their hash instead of being read again. Folders have no hash.
+    """
+    previous = previous or {}
+    entries = {}
+    for item in items:
+        if stat.S_ISDIR(item.stat.st_mode):
+            entries[item.arcname] = [0, 0, None]
+            continue
+        size, mtime_ns = item.stat.st_size, item.stat.st_mtime_ns
+        old = previous.get(item.arcname)
+        if old and old[0] == size and old[1] == mtime_ns and old[2]:
+            digest = old[2]
+        else:
+            digest = file_digest(item.path)
+        entries[item.arcname] = [size, mtime_ns, digest]
+    return entries
+
+def diff_entries(old, new):
+    """Return (changed, deleted): names that are new or have other contents, and names that are gone"""
+    changed = [name for name, entry in new.items()
+               if name not in old or old[name][0] != entry[0] or old[name][2] != entry[2]]
+    deleted = [name for name in old if name not in new]
+    return changed, deleted
+
+def save_manifest(archive_path, manifest):
+    """Save a manifest next to its archive"""
+    with open(manifest_path(archive_path), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+
+def load_manifest(archive_path):
+    """Return the manifest of an archive, raising ManifestError if it is missing or invalid"""
+    try:
+        with open(manifest_path(archive_path), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"No manifest for {archive_path}: {e}")
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        raise ManifestError(f"Unsupported manifest for {archive_path}")
+    return manifest
+
+def create_incremental(archive_path, files, base=None, compression_level=None, workers=None):
+    """Create a ZIP archive of the files that changed since the base archive
+
+    Without a base every file is archived and the result starts a new chain.
+    The manifest is saved next to the archive. Returns (members written,
+    tombstones recorded).
+    """
+    archive_path = os.path.abspath(archive_path)
+    previous = load_manifest(base)['entries'] if base else {}
+    items = list(collect_inputs(files))
+    entries = build_entries(items, previous)
+    changed, deleted = diff_entries(previous, entries)
+
+    changed_names = set(changed)
+    count = write_inputs(archive_path, [item for item in items if item.arcname in changed_names],
+                         compression_level, workers)
+    save_manifest(archive_path, {
+        'version': MANIFEST_VERSION,
+        # Relative, so the chain can be moved as a whole
+        'base': os.path.relpath(os.path.abspath(base), os.path.dirname(archive_path)) if base else None,
+        'entries': entries,
+        'changed': changed,
+        'deleted': deleted,
+    })
+    return count, len(deleted)
+
+def has_base(archive_path):
+    """Whether the archive is incremental, i.e. needs its base archives to be restored"""
+    try:
+        return bool(load_manifest(archive_path).get('base'))
+    except ManifestError:
+        return False
+
+def archive_chain(archive_path):
+    """Return [(archive path, manifest)] from the given archive back to the full one"""
+    chain = []
+    seen = set()
+    path = os.path.abspath(archive_path)
+    while path:
+        if path in seen:
+            raise ManifestError(f"Archive chain loops back to {path}")
+        seen.add(path)
+        if not os.path.isfile(path):
+            raise ManifestError(f"Base archive not found: {path}")
+        manifest = load_manifest(path)
+        chain.append((path, manifest))
+        base = manifest.get('base')
+        path = os.path.normpath(os.path.join(os.path.dirname(path), base)) if base else None
+    return chain
+
+def restore(archive_path, destination, workers=None):
+    """Restore the state recorded by an incremental archive into the destination folder
+
+    Every file is extracted once, from the newest archive in the chain that
+    holds it. Files deleted along the way are not restored. Returns the
+    number of members restored.
+    """
+    chain = archive_chain(archive_path)
+    remaining = set(chain[0][1]['entries'])
+    total = len(remaining)
+    for path, manifest in chain:
+        names = remaining.intersection(manifest['changed'])
+        if names:
+            if extract_zip(path, destination, workers, members=names) != len(names):
+                raise ManifestError(f"{path} lacks members its manifest lists")
+            remaining -= names
+    if remaining:
+        raise ManifestError(f"{len(remaining)} members are missing from the archive chain, "
+                            f"e.g. {sorted(remaining)[0]}")
+    return total
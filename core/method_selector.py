@@ -0,0 +1,85 @@
+"""
+Per-file compression method selection for HRNZipper
+Decides whether a file is worth compressing before the full compressor runs
+on it
+
+Three checks run in order of cost: the file extension, the magic bytes at the
+start of the file, and finally how well a fast zlib pass shrinks a sample
+from the start. Content that is already compressed (photos, video, audio,
+archives) is stored as it is.
+"""
+
+import os
+import zlib
+
+# Bytes compressed to estimate how compressible a file is
+SAMPLE_SIZE = 64 * 1024
+# Samples that do not shrink below this fraction are stored
+MAX_SAMPLE_RATIO = 0.95
+
+COMPRESSED_EXTENSIONS = frozenset((
+    # Images
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif', '.avif', '.jxl',
+    # Audio and video
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac', '.wma',
+    '.mp4', '.m4v', '.mkv', '.webm', '.mov', '.avi', '.wmv', '.flv',
+    # Archives and compressed containers
+    '.zip', '.7z', '.rar', '.gz', '.tgz', '.bz2', '.tbz2', '.xz', '.txz', '.zst',
+    '.lz4', '.lzma', '.cab', '.hrnd', '.jar', '.apk', '.whl', '.nupkg',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub',
+    # Fonts
+    '.woff', '.woff2',
+))
+
+# (offset, signature) of formats whose data is already compressed
+COMPRESSED_SIGNATURES = (
+    (0, b'\xff\xd8\xff'),           # JPEG
+    (0, b'\x89PNG\r\n\x1a\n'),      # PNG
+    (0, b'GIF8'),                   # GIF
+    (0, b'PK\x03\x04'),             # ZIP and ZIP based documents
+    (0, b"7z\xbc\xaf'\x1c"),        # 7z
+    (0, b'Rar!\x1a\x07'),           # RAR
+    (0, b'\x1f\x8b'),               # gzip
+    (0, b'BZh'),                    # bzip2
+    (0, b'\xfd7zXZ\x00'),           # xz
+    (0, b'\x28\xb5\x2f\xfd'),       # Zstandard
+    (0, b'\x04\x22\x4d\x18'),       # LZ4 frame
+    (0, b'OggS'),                   # Ogg
+    (0, b'fLaC'),                   # FLAC
+    (0, b'ID3'),                    # MP3 with ID3 tag
+    (0, b'\x1a\x45\xdf\xa3'),       # Matroska and WebM
+    (4, b'ftyp'),                   # MP4, MOV, HEIC
+    (8, b'WEBP'),                   # WebP in RIFF
+    (0, b'wOF2'),                   # WOFF2
+)
+
+def has_compressed_signature(head):
+    """Whether the first bytes of a file mark an already compressed format"""
+    return any(head[offset:offset + len(signature)] == signature
+               for offset, signature in COMPRESSED_SIGNATURES)
+
+def is_compressible_sample(sample):
+    """Whether a fast zlib pass shrinks the sample enough to be worth compressing"""
+    sample = sample[:SAMPLE_SIZE]
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * MAX_SAMPLE_RATIO
+
+def should_compress(path, head=None):
+    """Whether a file is worth compressing
+
+    ``head`` is the start of the file, at least SAMPLE_SIZE bytes of it if
+    the file is that large. It is read from the file when not given.
+    """
+    if os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return False
+    if head is None:
+        head = read_head(path)
+    if has_compressed_signature(head):
+        return False
+    return is_compressible_sample(head)
+
+def read_head(path):
+    """Return the first SAMPLE_SIZE bytes of a file"""
+    with open(path, 'rb') as f:
+        return f.read(SAMPLE_SIZE)
@@ -0,0 +1,219 @@
+"""
+Background job scheduler for HRNZipper
+Runs archive operations on a bounded pool of threads, most urgent first
+
+Jobs wait in a priority queue. Interactive work such as previews and
+listings goes ahead of extractions, which go ahead of batch work like
+creating archives. Jobs of the same priority run in the order they were
+submitted. At most ``per_disk`` jobs run at once against any one device, so
+several large jobs on one disk do not fight over it while jobs on other
+disks keep going.
+
+Cancellation is cooperative. Every job gets a CancelToken as its ``cancel``
+argument, and the archive operations call its check() between chunks, which
+raises JobCancelled. A job cancelled before it starts never runs.
+"""
+
+import os
+import heapq
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+INTERACTIVE = 0
+NORMAL = 10
+BATCH = 20
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+class JobCancelled(Exception):
+    """Raised inside a job that has been cancelled"""
+
+class CancelToken:
+    """Flag a running operation polls to learn it should stop"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise JobCancelled if the token has been cancelled"""
+        if self._event.is_set():
+            raise JobCancelled()
+
+def disk_of(path):
+    """Return the device a path lives on, or None if no part of it exists
+
+    Paths that do not exist yet, like an archive about to be created, count
+    as the device of their nearest existing parent.
+    """
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+class Job:
+    """A submitted operation, its state and its outcome"""
+
+    def __init__(self, func, args, kwargs, priority, disks, name):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.disks = disks
+        self.name = name or getattr(func, '__name__', 'job')
+        self.token = CancelToken()
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop, a job that has not started yet is dropped"""
+        self.token.cancel()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish, returns False on timeout"""
+        return self._done.wait(timeout)
+
+class JobScheduler:
+    """Priority queue of jobs run by a fixed number of worker threads"""
+
+    def __init__(self, workers=None, per_disk=2):
+        self._per_disk = per_disk
+        self._condition = threading.Condition()
+        self._queue = []
+        self._order = itertools.count()
+        self._running = set()
+        self._busy = {}
+        self._unfinished = 0
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, name=f'JobWorker-{number}', daemon=True)
+                         for number in range(workers or min(4, os.cpu_count() or 1))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, func, *args, priority=NORMAL, paths=(), name=None, **kwargs):
+        """Queue ``func(*args, cancel=token, **kwargs)`` and return its Job
+
+        ``paths`` are the files and folders the job reads or writes, they
+        decide which disks it counts against.
+        """
+        disks = frozenset(disk for disk in map(disk_of, paths) if disk is not None)
+        job = Job(func, args, kwargs, priority, disks, name)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The scheduler has been shut down")
+            heapq.heappush(self._queue, (priority, next(self._order), job))
+            self._unfinished += 1
+            self._condition.notify_all()
+        return job
+
+    def cancel(self, job):
+        """Cancel one job and let an idle worker drop it if it has not started"""
+        job.cancel()
+        with self._condition:
+            self._condition.notify_all()
+
+    def cancel_all(self):
+        """Cancel every queued and running job"""
+        with self._condition:
+            for _, _, job in self._queue:
+                job.cancel()
+            for job in self._running:
+                job.cancel()
+            self._condition.notify_all()
+
+    def join(self):
+        """Wait until every submitted job has finished"""
+        with self._condition:
+            while self._unfinished:
+                self._condition.wait()
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the queue is empty"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _finish(self, job, state):
+        # Called with the condition held
+        job.state = state
+        job._done.set()
+        self._unfinished -= 1
+        self._condition.notify_all()
+
+    def _take(self):
+        """Pop the most urgent job whose disks have room, called with the condition held"""
+        skipped = []
+        found = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            job = entry[2]
+            if job.token.cancelled:
+                self._finish(job, CANCELLED)
+            elif all(self._busy.get(disk, 0) < self._per_disk for disk in job.disks):
+                found = job
+                break
+            else:
+                skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return found
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._take()
+                while job is None:
+                    if self._closed and not self._queue:
+                        return
+                    self._condition.wait()
+                    job = self._take()
+                for disk in job.disks:
+                    self._busy[disk] = self._busy.get(disk, 0) + 1
+                self._running.add(job)
+                job.state = RUNNING
+
+            try:
+                job.result = job.func(*job.args, cancel=job.token, **job.kwargs)
+                state = DONE
+            except JobCancelled:
+                state = CANCELLED
+            except Exception as e:
+                logger.error(f"{job.name} failed: {e}")
+                job.error = e
+                state = FAILED
+
+            with self._condition:
+                for disk in job.disks:
+                    self._busy[disk] -= 1
+                    if not self._busy[disk]:
+                        del self._busy[disk]
+                self._running.discard(job)
+                self._finish(job, state)
@@ -0,0 +1,360 @@
+"""
+Checkpoint index for compressed TAR archives
+Lets single members of a .tar.gz or .tar.bz2 be read without decompressing
+everything in front of them
+
+A checkpoint is a place in the compressed file where decompression can start
+from scratch, paired with the matching offset in the uncompressed tar stream.
+Python's zlib has no inflatePrime, so a gzip stream cannot be resumed in the
+middle of a deflate block the way zran does it. Checkpoints therefore sit on
+gzip member and bzip2 stream boundaries. Archives written by ``write_tar``
+start a new member or stream every ``SPAN`` bytes, so any of their members is
+at most one span of decompression away. Archives from other tools usually
+hold one member and get a single checkpoint at the start.
+
+The index is built in one pass over the archive, or while writing it, and is
+saved next to the archive. It is rebuilt whenever the archive size or
+modification time no longer match.
+"""
+
+import io
+import os
+import bz2
+import json
+import zlib
+import bisect
+import shutil
+import logging
+import tarfile
+import tempfile
+
+from core.zip_extract import safe_member_path
+from core.zip_writer import collect_inputs
+
+logger = logging.getLogger(__name__)
+
+GZIP = 'gz'
+BZIP2 = 'bz2'
+
+# Uncompressed bytes between checkpoints
+SPAN = 4 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+INDEX_SUFFIX = '.hrnidx'
+INDEX_VERSION = 1
+
+class TarIndexError(ValueError):
+    """Raised when a compressed TAR archive cannot be indexed or read"""
+
+def compression_of(path):
+    """Return GZIP or BZIP2 for compressed TAR file names, None otherwise"""
+    name = str(path).lower()
+    if name.endswith(('.tar.gz', '.tgz')):
+        return GZIP
+    if name.endswith(('.tar.bz2', '.tbz2', '.tbz')):
+        return BZIP2
+    return None
+
+def _decompressor(compression):
+    return zlib.decompressobj(31) if compression == GZIP else bz2.BZ2Decompressor()
+
+def _compressor(compression, level):
+    if compression == GZIP:
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    return bz2.BZ2Compressor(level)
+
+class _CheckpointReader(io.RawIOBase):
+    """Decompressed view of a gzip or bzip2 file starting at a checkpoint
+
+    Every member or stream boundary that is at least ``span`` bytes past the
+    previous checkpoint is added to ``checkpoints``.
+    """
+
+    def __init__(self, f, compression, offset=0, position=0, span=SPAN):
+        super().__init__()
+        self.checkpoints = []
+        self.position = position
+        self._file = f
+        self._compression = compression
+        self._span = span
+        self._decompressor = None
+        self._input = b''
+        self._input_offset = offset
+        f.seek(offset)
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        data = self._file.read(CHUNK_SIZE)
+        self._input += data
+        return bool(data)
+
+    def _decompress(self, size):
+        decompressor = self._decompressor
+        try:
+            if self._compression == GZIP:
+                data = self._input
+                output = decompressor.decompress(data, size)
+                # Input zlib has not consumed yet stays ours
+                self._input = decompressor.unconsumed_tail
+                self._input_offset += len(data) - len(self._input)
+            elif decompressor.needs_input:
+                data, self._input = self._input, b''
+                self._input_offset += len(data)
+                output = decompressor.decompress(data, size)
+            else:
+                output = decompressor.decompress(b'', size)
+        except (OSError, zlib.error) as e:
+            raise TarIndexError(f"Bad compressed data at offset {self._input_offset}: {e}")
+
+        if decompressor.eof:
+            # Whatever follows the end of this member belongs to the next one
+            rest = decompressor.unused_data
+            self._input = rest + self._input
+            self._input_offset -= len(rest)
+            self._decompressor = None
+        return output
+
+    def readinto(self, buffer):
+        while True:
+            if self._decompressor is None:
+                if not self._input and not self._fill():
+                    return 0
+                last = self.checkpoints[-1][1] if self.checkpoints else None
+                if last is None or self.position - last >= self._span:
+                    self.checkpoints.append((self._input_offset, self.position))
+                self._decompressor = _decompressor(self._compression)
+            elif not self._input and getattr(self._decompressor, 'needs_input', True):
+                if not self._fill():
+                    raise TarIndexError("Compressed data ends in the middle of a member")
+
+            output = self._decompress(len(buffer))
+            if output:
+                buffer[:len(output)] = output
+                self.position += len(output)
+                return len(output)
+
+class _CheckpointWriter:
+    """File-like target that starts a new gzip member or bzip2 stream every span bytes"""
+
+    def __init__(self, f, compression, level, span=SPAN):
+        self.checkpoints = []
+        self._file = f
+        self._compression = compression
+        self._level = level
+        self._span = span
+        self._compressor = None
+        self._in_member = 0
+        self._position = 0
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        data = memoryview(data)
+        written = len(data)
+        while data:
+            if self._compressor is None:
+                self.checkpoints.append((self._file.tell(), self._position))
+                self._compressor = _compressor(self._compression, self._level)
+                self._in_member = 0
+            piece = data[:self._span - self._in_member]
+            self._file.write(self._compressor.compress(piece))
+            self._in_member += len(piece)
+            self._position += len(piece)
+            data = data[len(piece):]
+            if self._in_member >= self._span:
+                self._end_member()
+        return written
+
+    def _end_member(self):
+        self._file.write(self._compressor.flush())
+        self._compressor = None
+
+    def close(self):
+        if self._compressor is not None:
+            self._end_member()
+
+def index_path(archive_path):
+    """Return where the index of an archive is saved"""
+    return str(archive_path) + INDEX_SUFFIX
+
+def _member_row(info):
+    kind = 'dir' if info.isdir() else 'file' if info.isreg() and not info.issparse() else 'other'
+    return [info.name, kind, info.offset_data, info.size]
+
+def _new_index(archive_path, compression, checkpoints, members):
+    info = os.stat(archive_path)
+    return {
+        'version': INDEX_VERSION,
+        'compression': compression,
+        'size': info.st_size,
+        'mtime_ns': info.st_mtime_ns,
+        'checkpoints': [list(point) for point in checkpoints],
+        'members': members,
+    }
+
+def save_index(archive_path, index):
+    """Save an index next to its archive, a read-only folder only costs the speed-up"""
+    try:
+        with open(index_path(archive_path), 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+    except OSError as e:
+        logger.warning(f"Could not save the TAR index of {archive_path}: {e}")
+
+def load_index(archive_path):
+    """Return the saved index of an archive, or None if it is missing or stale"""
+    try:
+        with open(index_path(archive_path), encoding='utf-8') as f:
+            index = json.load(f)
+        info = os.stat(archive_path)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(index, dict) or index.get('version') != INDEX_VERSION
+            or index.get('size') != info.st_size or index.get('mtime_ns') != info.st_mtime_ns):
+        return None
+    return index
+
+def build_index(archive_path, span=SPAN):
+    """Index a compressed TAR archive in one decompression pass and save the index"""
+    compression = compression_of(archive_path)
+    if compression is None:
+        raise TarIndexError(f"Not a .tar.gz or .tar.bz2 archive: {archive_path}")
+
+    with open(archive_path, 'rb') as f:
+        reader = _CheckpointReader(f, compression, span=span)
+        try:
+            with tarfile.open(fileobj=io.BufferedReader(reader, CHUNK_SIZE), mode='r|') as tar:
+                members = [_member_row(info) for info in tar]
+        except tarfile.TarError as e:
+            raise TarIndexError(f"Bad TAR archive {archive_path}: {e}")
+
+    index = _new_index(archive_path, compression, reader.checkpoints, members)
+    save_index(archive_path, index)
+    return index
+
+def get_index(archive_path):
+    """Return the saved index of an archive, building it first if needed"""
+    return load_index(archive_path) or build_index(archive_path)
+
+def write_tar(archive_path, files, compression_level=None, span=SPAN):
+    """Create a .tar.gz or .tar.bz2 archive with a checkpoint every span bytes
+
+    The compression follows the archive name. The index is saved along with
+    the archive, so reading single members needs no indexing pass. Returns
+    the number of members written.
+    """
+    compression = compression_of(archive_path)
+    if compression is None:
+        raise TarIndexError(f"Not a .tar.gz or .tar.bz2 archive: {archive_path}")
+    if compression_level is None:
+        level = 6 if compression == GZIP else 9
+    else:
+        level = compression_level
+    if not (0 if compression == GZIP else 1) <= level <= 9:
+        raise ValueError(f"Invalid compression level: {compression_level}")
+
+    archive_path = os.path.abspath(archive_path)
+    fd, temp_path = tempfile.mkstemp(prefix='.hrnzipper-', suffix='.tmp',
+                                     dir=os.path.dirname(archive_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer = _CheckpointWriter(f, compression, level, span)
+            with tarfile.open(fileobj=writer, mode='w', format=tarfile.PAX_FORMAT) as tar:
+                for item in collect_inputs(files):
+                    # The temporary archive is inside the tree when archiving its own folder
+                    if os.path.normcase(item.path) == os.path.normcase(temp_path):
+                        continue
+                    tar.add(item.path, item.arcname.rstrip('/'), recursive=False)
+                    # tarfile only records data offsets when reading, the
+                    # data is the padded blocks just written
+                    info = tar.members[-1]
+                    padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE if info.isreg() else 0
+                    info.offset_data = tar.offset - padded
+                members = [_member_row(info) for info in tar.getmembers()]
+            writer.close()
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    save_index(archive_path, _new_index(archive_path, compression, writer.checkpoints, members))
+    return len(members)
+
+def open_member(archive_path, name, index=None):
+    """Return the data of one TAR member as a binary stream, starting at the nearest checkpoint
+
+    Raises KeyError if there is no regular file with that name.
+    """
+    index = index or get_index(archive_path)
+    for member_name, kind, offset, size in reversed(index['members']):
+        if member_name == name and kind == 'file':
+            break
+    else:
+        raise KeyError(f"No file named {name} in {archive_path}")
+
+    positions = [position for _, position in index['checkpoints']]
+    compressed_offset, position = index['checkpoints'][bisect.bisect_right(positions, offset) - 1]
+
+    f = open(archive_path, 'rb')
+    try:
+        reader = io.BufferedReader(
+            _CheckpointReader(f, index['compression'], compressed_offset, position), CHUNK_SIZE)
+        # Decompress from the checkpoint up to the member data
+        skip = offset - position
+        while skip:
+            data = reader.read(min(skip, CHUNK_SIZE))
+            if not data:
+                raise TarIndexError(f"Archive ends before member {name}")
+            skip -= len(data)
+    except BaseException:
+        f.close()
+        raise
+    return _LimitedReader(reader, size)
+
+class _LimitedReader(io.RawIOBase):
+    """The first ``size`` bytes of a stream, closing the stream when closed"""
+
+    def __init__(self, stream, size):
+        super().__init__()
+        self._stream = stream
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._remaining:
+            return 0
+        data = self._stream.read(min(len(buffer), self._remaining))
+        if not data:
+            raise TarIndexError("Archive ends in the middle of a member")
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+def extract_members(archive_path, names, destination):
+    """Extract the named TAR members only, returns the number extracted"""
+    index = get_index(archive_path)
+    folders = {member_name for member_name, kind, _, _ in index['members'] if kind == 'dir'}
+    destination = os.path.abspath(destination)
+    for name in names:
+        target = safe_member_path(destination, name)
+        if target is None:
+            continue
+        if name.rstrip('/') in folders:
+            os.makedirs(target, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open_member(archive_path, name, index) as source, open(target, 'wb') as out:
+            shutil.copyfileobj(source, out, CHUNK_SIZE)
+    return len(names)
@@ -0,0 +1,102 @@
+"""
+Parallel folder walker for HRNZipper
+Enumerates the inputs of an archive with several folders scanned at once
+
+Folders are read with os.scandir on a thread pool, and the stat of every
+entry is taken there too, so the system calls of many folders overlap
+instead of running one after another. The folders next in line are scanned
+ahead of time, a bounded number of them, while entries are handed out in the
+same order as a sorted top-down os.walk: a folder, its files, then each of
+its subfolders in turn. Entries stream out as soon as their folder has been
+read, and the walker keeps running file, folder and byte counts that a
+progress display can read from another thread.
+"""
+
+import os
+import stat
+import logging
+import itertools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# A found file or folder, name is relative to the folder holding the walked
+# path and uses forward slashes
+WalkEntry = namedtuple('WalkEntry', ['path', 'name', 'stat'])
+
+def scan_folder(path):
+    """Return (files, folders) of one folder as sorted lists of (name, path, stat)
+
+    Links to folders are skipped like os.walk does, and entries that cannot
+    be read, such as broken links, are logged and skipped.
+    """
+    files = []
+    folders = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            folders.append((entry.name, entry.path, entry.stat()))
+                    else:
+                        files.append((entry.name, entry.path, entry.stat()))
+                except OSError as e:
+                    logger.warning(f"Skipping {entry.path}: {e}")
+    except OSError as e:
+        logger.warning(f"Cannot read folder {path}: {e}")
+    files.sort()
+    folders.sort()
+    return files, folders
+
+class Walker:
+    """Walks folder trees, counting what it has handed out so far"""
+
+    def __init__(self, workers=None, window=None):
+        self.workers = workers or min(16, (os.cpu_count() or 1) * 4)
+        # Folders scanned ahead of the one being handed out
+        self.window = window or self.workers * 4
+        self.files = 0
+        self.folders = 0
+        self.bytes = 0
+
+    def walk(self, top):
+        """Yield a WalkEntry for the given path and, for a folder, everything in it"""
+        top = os.path.abspath(top)
+        entry = WalkEntry(top, os.path.basename(top), os.stat(top))
+        if not stat.S_ISDIR(entry.stat.st_mode):
+            yield self._count(entry)
+            return
+
+        executor = ThreadPoolExecutor(self.workers)
+        try:
+            # Folders still to hand out, the next one last
+            stack = [entry]
+            scans = {}
+            while stack:
+                for folder in itertools.islice(reversed(stack), self.window):
+                    if len(scans) >= self.window:
+                        break
+                    if folder.path not in scans:
+                        scans[folder.path] = executor.submit(scan_folder, folder.path)
+                folder = stack.pop()
+                yield self._count(folder)
+                # Scans ahead can fill the window with folders deeper in the
+                # stack, the next one is then read here
+                scan = scans.pop(folder.path, None)
+                files, folders = scan.result() if scan else scan_folder(folder.path)
+                for child, path, info in files:
+                    yield self._count(WalkEntry(path, f'{folder.name}/{child}', info))
+                stack.extend(WalkEntry(path, f'{folder.name}/{child}', info)
+                             for child, path, info in reversed(folders))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _count(self, entry):
+        if stat.S_ISDIR(entry.stat.st_mode):
+            self.folders += 1
+        else:
+            self.files += 1
+            self.bytes += entry.stat.st_size
+        return entry
@@ -0,0 +1,241 @@
+"""
+Parallel ZIP extraction for HRNZipper
+Decompresses independent members concurrently on a bounded worker pool
+
+Every worker reads through its own archive handle, going straight to each
+member's local header by the offset from the central directory. A byte
+budget caps the compressed and decompressed data held in flight, so memory
+stays bounded whatever the member sizes.
+
+Member data is never copied into Python buffers. Stored members are copied
+file to file inside the kernel with copy_file_range or sendfile, and the
+decompressor is fed slices of a memory map of the archive.
+"""
+
+import os
+import mmap
+import zlib
+import errno
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.zip_listing import (
+    LOCAL_HEADER, LOCAL_HEADER_SIGNATURE, UnsupportedMemberError, ZipDataError, list_zip,
+)
+
+STORED = 0
+DEFLATED = 8
+SUPPORTED_METHODS = (STORED, DEFLATED)
+ENCRYPTED_FLAG = 0x1
+
+# Members are read and written in pieces of this size
+CHUNK_SIZE = 1024 * 1024
+# Compressed input handed to the decompressor at a time, small enough that
+# its output rarely reaches CHUNK_SIZE and leaves input to copy
+INPUT_CHUNK = 256 * 1024
+MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+
+# Errors that mean a kernel copy is not possible between these files
+NO_KERNEL_COPY = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+                  errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOTSOCK, errno.EPERM}
+
+class ByteBudget:
+    """Counting semaphore measured in bytes
+
+    A request larger than the whole budget is granted once nothing else is
+    in flight, so one huge member cannot block forever.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, amount):
+        with self._condition:
+            while self.used and self.used + amount > self.limit:
+                self._condition.wait()
+            self.used += amount
+
+    def release(self, amount):
+        with self._condition:
+            self.used -= amount
+            self._condition.notify_all()
+
+def safe_member_path(destination, name):
+    """Return where a member is extracted, refusing names that leave the destination"""
+    parts = []
+    for part in name.replace('\\', '/').split('/'):
+        part = os.path.splitdrive(part)[1]
+        if part in ('', '.', '..'):
+            continue
+        parts.append(part)
+    if not parts:
+        return None
+    return os.path.join(destination, *parts)
+
+def member_data_offset(f, entry):
+    """Return the position of a member's data, checking its local header"""
+    f.seek(entry.header_offset)
+    header = f.read(LOCAL_HEADER.size)
+    if len(header) != LOCAL_HEADER.size or header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise ZipDataError(f"Bad local file header: {entry.name}")
+    name_length, extra_length = LOCAL_HEADER.unpack(header)[9:11]
+    return entry.header_offset + LOCAL_HEADER.size + name_length + extra_length
+
+def check_supported(entry):
+    """Raise UnsupportedMemberError for members this module cannot decompress"""
+    if entry.flags & ENCRYPTED_FLAG:
+        raise UnsupportedMemberError(f"Member is encrypted: {entry.name}")
+    if entry.method not in SUPPORTED_METHODS:
+        raise UnsupportedMemberError(f"Unsupported compression method {entry.method}: {entry.name}")
+
+def _copy_file_range(source_fd, target_fd, offset, length):
+    return os.copy_file_range(source_fd, target_fd, length, offset)
+
+def _sendfile(source_fd, target_fd, offset, length):
+    return os.sendfile(target_fd, source_fd, offset, length)
+
+KERNEL_COPIES = [copy for name, copy in (('copy_file_range', _copy_file_range),
+                                         ('sendfile', _sendfile)) if hasattr(os, name)]
+
+def copy_range(source_fd, target_fd, offset, length):
+    """Copy a byte range of one file to the current position of another inside the kernel
+
+    Returns False without copying anything when neither copy_file_range nor
+    sendfile works for these files, e.g. on Windows. Buffered writes to the
+    target must be flushed first.
+    """
+    for copy in KERNEL_COPIES:
+        copied = 0
+        try:
+            while copied < length:
+                count = copy(source_fd, target_fd, offset + copied, length - copied)
+                if not count:
+                    raise ZipDataError("Archive ends in the middle of a member")
+                copied += count
+            return True
+        except OSError as e:
+            if copied or e.errno not in NO_KERNEL_COPY:
+                raise
+    return False
+
+def _extract_member(f, data, entry, target, cancel=None):
+    """Extract one member into the target file
+
+    ``f`` is the worker's own archive handle and ``data`` a memory map of
+    the whole archive. ``cancel`` is checked before every input chunk.
+    """
+    position = member_data_offset(f, entry)
+    end = position + entry.compressed_size
+    if end > len(data):
+        raise ZipDataError(f"Truncated member data: {entry.name}")
+
+    with memoryview(data) as view, view[position:end] as member:
+        if entry.method != DEFLATED:
+            if entry.compressed_size != entry.size or zlib.crc32(member) != entry.crc:
+                raise ZipDataError(f"Bad CRC-32 or size: {entry.name}")
+            with open(target, 'wb') as out:
+                if not copy_range(f.fileno(), out.fileno(), position, entry.size):
+                    out.write(member)
+            return
+
+        decompressor = zlib.decompressobj(-15)
+        crc = 0
+        written = 0
+        with open(target, 'wb') as out:
+            for start in range(0, len(member), INPUT_CHUNK):
+                if cancel is not None:
+                    cancel.check()
+                # Views of the map are released on every exit, so the map can close
+                with member[start:start + INPUT_CHUNK] as piece:
+                    # Bound the output of every step, deflate can expand 1000 times
+                    while piece:
+                        try:
+                            output = decompressor.decompress(piece, CHUNK_SIZE)
+                        except zlib.error as e:
+                            raise ZipDataError(f"Bad deflate stream: {entry.name}: {e}")
+                        piece = decompressor.unconsumed_tail
+                        crc = zlib.crc32(output, crc)
+                        written += len(output)
+                        out.write(output)
+
+    if not decompressor.eof:
+        raise ZipDataError(f"Truncated deflate stream: {entry.name}")
+    if written != entry.size or crc != entry.crc:
+        raise ZipDataError(f"Bad CRC-32 or size: {entry.name}")
+
+def extract_zip(archive_path, destination, workers=None, max_inflight_bytes=MAX_INFLIGHT_BYTES,
+                members=None, cancel=None):
+    """Extract every member of a ZIP archive into the destination folder
+
+    ``members`` limits the extraction to a set of member names. ``cancel``
+    is an optional core.scheduler.CancelToken, checked before every member
+    and every chunk of deflated members. Returns the number of members
+    extracted. Raises UnsupportedMemberError before writing anything if a
+    member is encrypted or uses a compression method other than stored or
+    deflate.
+    """
+    listing = list_zip(archive_path)
+    entries = [entry for entry in listing if members is None or entry.name in members]
+    for entry in entries:
+        check_supported(entry)
+
+    destination = os.path.abspath(destination)
+    files = []
+    folders = {destination}
+    for entry in entries:
+        target = safe_member_path(destination, entry.name)
+        if target is None:
+            continue
+        if entry.is_dir:
+            folders.add(target)
+        else:
+            folders.add(os.path.dirname(target))
+            files.append((entry, target))
+    for folder in sorted(folders):
+        os.makedirs(folder, exist_ok=True)
+
+    budget = ByteBudget(max_inflight_bytes)
+    handles = threading.local()
+    opened = []
+    opened_lock = threading.Lock()
+    failed = threading.Event()
+
+    def worker(entry, target, cost):
+        try:
+            if failed.is_set():
+                return
+            f = getattr(handles, 'file', None)
+            if f is None:
+                # Every worker thread reads through its own handle
+                f = handles.file = open(archive_path, 'rb')
+                with opened_lock:
+                    opened.append(f)
+            _extract_member(f, data, entry, target, cancel)
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            budget.release(cost)
+
+    with open(archive_path, 'rb') as archive:
+        data = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        with ThreadPoolExecutor(workers or os.cpu_count() or 1) as executor:
+            futures = []
+            for entry, target in files:
+                if failed.is_set():
+                    break
+                if cancel is not None:
+                    cancel.check()
+                cost = min(entry.compressed_size, CHUNK_SIZE) + min(entry.size, CHUNK_SIZE)
+                budget.acquire(cost)
+                futures.append(executor.submit(worker, entry, target, cost))
+            for future in futures:
+                future.result()
+    finally:
+        for f in opened:
+            f.close()
+        data.close()
+    return len(entries)
@@ -0,0 +1,343 @@
+"""
+Central directory ZIP listing for HRNZipper
+Lists a ZIP archive from its end of central directory record and central
+directory only, without building zipfile.ZipInfo objects or touching member data
+
+The fixed-size part of every central directory header is gathered into one
+buffer and each field is then extracted for all entries at once into a packed
+array, so the per-entry Python work is limited to finding the next header.
+"""
+
+import sys
+import mmap
+import bisect
+import struct
+from array import array
+from itertools import accumulate
+from collections import namedtuple
+from collections.abc import Sequence
+
+# End of central directory record and its ZIP64 counterparts
+EOCD = struct.Struct('<4s4H2LH')
+EOCD_SIGNATURE = b'PK\x05\x06'
+ZIP64_LOCATOR = struct.Struct('<4sLQL')
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP64_EOCD = struct.Struct('<4sQ2H2L4Q')
+ZIP64_EOCD_SIGNATURE = b'PK\x06\x06'
+
+# Central directory file header, the variable-length name, extra field and
+# comment follow the fixed part
+CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+CENTRAL_HEADER_SIZE = 46
+CENTRAL_HEADER_SIGNATURE = 0x02014B50
+CENTRAL_HEADER_LENGTHS = struct.Struct('<3H')
+
+# Local file header written before every member's data, followed by the name
+# and extra field
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_PLACEHOLDER = 0xFFFFFFFF
+UTF8_FLAG = 0x800
+MAX_COMMENT = 0xFFFF
+
+ZipEntry = namedtuple('ZipEntry', [
+    'name', 'size', 'compressed_size', 'crc', 'method', 'flags',
+    'date_time', 'header_offset', 'is_dir',
+])
+
+class ZipListingError(ValueError):
+    """Raised when the archive has no valid central directory"""
+
+class UnsupportedMemberError(ZipListingError):
+    """Raised for members that are encrypted or use an unsupported compression method"""
+
+class ZipDataError(ValueError):
+    """Raised when member data does not match its headers"""
+
+def _typecode(size):
+    """Return the array typecode of an unsigned integer with the given byte size"""
+    for code in ('H', 'I', 'L', 'Q'):
+        if array(code).itemsize == size:
+            return code
+    raise ZipListingError(f"No {size} byte array type on this platform")
+
+U16 = _typecode(2)
+U32 = _typecode(4)
+
+class NameTable(Sequence):
+    """Member names packed into one string with an array of start offsets
+
+    A list of separate str objects costs about 50 bytes per name on top of
+    the characters, the table costs 4.
+    """
+
+    __slots__ = ('_text', '_starts')
+
+    def __init__(self, names=()):
+        names = list(names)
+        self._text = ''.join(names)
+        typecode = U32 if len(self._text) <= 0xFFFFFFFF else 'Q'
+        self._starts = array(typecode, accumulate(map(len, names), initial=0))
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('name index out of range')
+        return self._text[self._starts[index]:self._starts[index + 1]]
+
+    def __iter__(self):
+        text = self._text
+        starts = self._starts
+        for index in range(len(starts) - 1):
+            yield text[starts[index]:starts[index + 1]]
+
+    def __eq__(self, other):
+        if isinstance(other, (NameTable, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'NameTable({list(self)!r})'
+
+    def index(self, name, start=0, stop=None):
+        """Return the index of the first member with this name"""
+        count = len(self) if stop is None else min(stop, len(self))
+        starts = self._starts
+        # Search the packed text and keep only hits that span exactly one name
+        position = self._text.find(name, starts[start] if start < count else len(self._text))
+        while position >= 0:
+            index = bisect.bisect_left(starts, position)
+            if index >= count:
+                break
+            if starts[index] == position and starts[index + 1] == position + len(name):
+                return index
+            position = self._text.find(name, position + 1)
+        raise ValueError(f'{name!r} is not in the listing')
+
+class ZipListing:
+    """Columnar listing of a ZIP archive
+
+    Member names are kept in a NameTable, every other field in a packed
+    array. Indexing and iteration produce ZipEntry tuples on demand.
+    """
+
+    __slots__ = ('names', 'sizes', 'compressed_sizes', 'crcs', 'methods',
+                 'flags', 'dos_dates', 'dos_times', 'header_offsets')
+
+    def __init__(self, names, sizes, compressed_sizes, crcs, methods, flags,
+                 dos_dates, dos_times, header_offsets):
+        self.names = names
+        self.sizes = sizes
+        self.compressed_sizes = compressed_sizes
+        self.crcs = crcs
+        self.methods = methods
+        self.flags = flags
+        self.dos_dates = dos_dates
+        self.dos_times = dos_times
+        self.header_offsets = header_offsets
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        name = self.names[index]
+        dos_date = self.dos_dates[index]
+        dos_time = self.dos_times[index]
+        date_time = ((dos_date >> 9) + 1980, (dos_date >> 5) & 0xF, dos_date & 0x1F,
+                     dos_time >> 11, (dos_time >> 5) & 0x3F, (dos_time & 0x1F) * 2)
+        return ZipEntry(name, self.sizes[index], self.compressed_sizes[index],
+                        self.crcs[index], self.methods[index], self.flags[index],
+                        date_time, self.header_offsets[index], name.endswith('/'))
+
+    def __iter__(self):
+        for index in range(len(self.names)):
+            yield self[index]
+
+def _find_eocd(data):
+    """Return the position of the end of central directory record
+    
+    A record whose comment reaches exactly to the end of the file is
+    preferred, which skips the signature appearing inside the comment. Like
+    zipfile, the last complete record is accepted otherwise, so archives
+    with padding or other data appended still open.
+    """
+    size = len(data)
+    start = max(0, size - EOCD.size - MAX_COMMENT)
+    fallback = None
+    position = data.rfind(EOCD_SIGNATURE, start)
+    while position >= 0:
+        if position + EOCD.size <= size:
+            comment_length = EOCD.unpack_from(data, position)[7]
+            if position + EOCD.size + comment_length == size:
+                return position
+            if fallback is None:
+                fallback = position
+        position = data.rfind(EOCD_SIGNATURE, start, position)
+    if fallback is None:
+        raise ZipListingError("End of central directory record not found")
+    return fallback
+
+def _read_directory_location(data, eocd_position):
+    """Return (entry count, directory size, directory end)"""
+    count, cd_size = EOCD.unpack_from(data, eocd_position)[4:6]
+    cd_end = eocd_position
+
+    locator_position = eocd_position - ZIP64_LOCATOR.size
+    if locator_position >= 0 and data[locator_position:locator_position + 4] == ZIP64_LOCATOR_SIGNATURE:
+        zip64_offset = ZIP64_LOCATOR.unpack_from(data, locator_position)[2]
+        # The record normally sits right before the locator, its stored offset
+        # is off by any data prepended to the archive
+        zip64_position = locator_position - ZIP64_EOCD.size
+        if data[zip64_position:zip64_position + 4] != ZIP64_EOCD_SIGNATURE:
+            zip64_position = zip64_offset
+        if data[zip64_position:zip64_position + 4] != ZIP64_EOCD_SIGNATURE:
+            raise ZipListingError("ZIP64 end of central directory record not found")
+        count, cd_size = ZIP64_EOCD.unpack_from(data, zip64_position)[7:9]
+        cd_end = zip64_position
+
+    return count, cd_size, cd_end
+
+def _column(headers, count, offset, width, typecode):
+    """Extract one little-endian field of every fixed header into an array"""
+    packed = bytearray(width * count)
+    for byte in range(width):
+        packed[byte::width] = headers[offset + byte::CENTRAL_HEADER_SIZE]
+    column = array(typecode, packed)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+def _decode_names(raw_names, flags):
+    """Decode member names, in one call when all of them share an encoding"""
+    utf8_count = sum(1 for flag in flags if flag & UTF8_FLAG)
+    if utf8_count in (0, len(flags)):
+        encoding = 'utf-8' if utf8_count else 'cp437'
+        joined = b'\x00'.join(raw_names)
+        if joined.count(b'\x00') == len(raw_names) - 1:
+            return joined.decode(encoding).split('\x00') if raw_names else []
+
+    return [raw.decode('utf-8' if flag & UTF8_FLAG else 'cp437')
+            for raw, flag in zip(raw_names, flags)]
+
+def _apply_zip64_extra(extra, size, compressed_size, header_offset):
+    """Replace 0xFFFFFFFF placeholders with the values from the ZIP64 extra field"""
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, field_size = struct.unpack_from('<2H', extra, position)
+        position += 4
+        if field_id == ZIP64_EXTRA_ID:
+            try:
+                values = iter(struct.unpack_from(f'<{field_size // 8}Q', extra, position))
+                if size == ZIP64_PLACEHOLDER:
+                    size = next(values)
+                if compressed_size == ZIP64_PLACEHOLDER:
+                    compressed_size = next(values)
+                if header_offset == ZIP64_PLACEHOLDER:
+                    header_offset = next(values)
+            except (struct.error, StopIteration):
+                raise ZipListingError("Truncated ZIP64 extra field")
+            break
+        position += field_size
+    return size, compressed_size, header_offset
+
+def _parse_directory(directory, count):
+    """Parse the central directory bytes into a ZipListing"""
+    lengths = CENTRAL_HEADER_LENGTHS.unpack_from
+    headers = []
+    raw_names = []
+    extras = []
+    add_header = headers.append
+    add_name = raw_names.append
+    add_extra = extras.append
+    end = len(directory)
+    position = 0
+
+    try:
+        for _ in range(count):
+            name_length, extra_length, comment_length = lengths(directory, position + 28)
+            name_start = position + CENTRAL_HEADER_SIZE
+            extra_start = name_start + name_length
+            add_header(directory[position:name_start])
+            add_name(directory[name_start:extra_start])
+            add_extra(extra_start)
+            position = extra_start + extra_length + comment_length
+    except struct.error:
+        raise ZipListingError("Truncated central directory")
+    if position > end:
+        raise ZipListingError("Truncated central directory")
+
+    fixed = b''.join(headers)
+    signatures = _column(fixed, count, 0, 4, U32)
+    if signatures.count(CENTRAL_HEADER_SIGNATURE) != count:
+        raise ZipListingError("Bad central directory file header")
+
+    flags = _column(fixed, count, 8, 2, U16)
+    listing = ZipListing(
+        names=NameTable(_decode_names(raw_names, flags)),
+        sizes=array('Q', _column(fixed, count, 24, 4, U32)),
+        compressed_sizes=array('Q', _column(fixed, count, 20, 4, U32)),
+        crcs=_column(fixed, count, 16, 4, U32),
+        methods=_column(fixed, count, 10, 2, U16),
+        flags=flags,
+        dos_dates=_column(fixed, count, 14, 2, U16),
+        dos_times=_column(fixed, count, 12, 2, U16),
+        header_offsets=array('Q', _column(fixed, count, 42, 4, U32)),
+    )
+
+    # Only entries with ZIP64 placeholders need their extra field parsed
+    columns = (listing.sizes, listing.compressed_sizes, listing.header_offsets)
+    if any(ZIP64_PLACEHOLDER in column for column in columns):
+        for index in range(count):
+            values = tuple(column[index] for column in columns)
+            if ZIP64_PLACEHOLDER in values:
+                extra_start = extras[index]
+                # The extra field length sits 30 bytes into the fixed header
+                extra_length = lengths(directory, extra_start - len(raw_names[index]) - 18)[1]
+                extra = directory[extra_start:extra_start + extra_length]
+                for column, value in zip(columns, _apply_zip64_extra(extra, *values)):
+                    column[index] = value
+
+    return listing
+
+def list_zip(path):
+    """Return the ZipListing of a ZIP archive, read from its central directory"""
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            raise ZipListingError("End of central directory record not found")
+
+    with data:
+        eocd_position = _find_eocd(data)
+        count, cd_size, cd_end = _read_directory_location(data, eocd_position)
+        cd_start = cd_end - cd_size
+        if cd_start < 0:
+            raise ZipListingError("Bad central directory offset")
+        listing = _parse_directory(data[cd_start:cd_end], count)
+
+        # Bytes prepended to the archive, e.g. a self-extractor stub, shift
+        # every stored offset by the same amount
+        stored_offset = _read_stored_offset(data, eocd_position, cd_end)
+        concat = cd_start - stored_offset
+        if concat < 0:
+            raise ZipListingError("Bad central directory offset")
+        if concat:
+            listing.header_offsets = array('Q', (offset + concat for offset in listing.header_offsets))
+        return listing
+
+def _read_stored_offset(data, eocd_position, cd_end):
+    """Return the central directory offset recorded in the archive"""
+    if cd_end != eocd_position:
+        return ZIP64_EOCD.unpack_from(data, cd_end)[9]
+    return EOCD.unpack_from(data, eocd_position)[6]
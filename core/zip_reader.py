@@ -0,0 +1,174 @@
+"""
+Random access to single ZIP members for HRNZipper
+Opens one member as a seekable stream without extracting the archive
+
+The member is found through the central directory and read straight from its
+local header onwards. Stored members seek directly; deflated members are
+decompressed lazily, so reading the start of a large file only inflates that
+start. Seeking backwards in a deflated member restarts its decompression.
+"""
+
+import io
+import os
+import shutil
+import zlib
+
+from core.zip_listing import ZipDataError, list_zip
+from core.zip_extract import (
+    CHUNK_SIZE, DEFLATED, check_supported, member_data_offset, safe_member_path,
+)
+
+class ZipMemberReader(io.RawIOBase):
+    """Seekable raw stream over one member of an open archive file
+
+    The reader owns the archive file and closes it when it is closed. The
+    CRC-32 is checked when a member is read from its start to its end.
+    """
+
+    def __init__(self, f, entry):
+        super().__init__()
+        check_supported(entry)
+        self.name = entry.name
+        self.size = entry.size
+        self._file = f
+        self._entry = entry
+        self._data_offset = member_data_offset(f, entry)
+        self._position = 0
+        self._restart()
+
+    def _restart(self):
+        """Go back to the start of the member data"""
+        self._raw_position = 0
+        self._tail = b''
+        self._decompressor = zlib.decompressobj(-15) if self._entry.method == DEFLATED else None
+        self._crc = 0
+        self._checked = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+
+        if self._decompressor:
+            if position < self._position:
+                self._restart()
+                self._position = 0
+            # Deflate has no random access, inflate and drop what is skipped
+            while self._position < min(position, self.size):
+                skipped = len(self._inflate(min(position, self.size) - self._position))
+                self._position += skipped
+        else:
+            self._position = position
+        if self._position == 0:
+            self._crc = self._checked = 0
+        elif self._checked != self._position:
+            self._checked = None
+        return self._position
+
+    def _read_raw(self, size):
+        """Read up to size bytes of compressed data"""
+        size = min(size, self._entry.compressed_size - self._raw_position)
+        if size <= 0:
+            return b''
+        self._file.seek(self._data_offset + self._raw_position)
+        data = self._file.read(size)
+        if not data:
+            raise ZipDataError(f"Truncated member data: {self.name}")
+        self._raw_position += len(data)
+        return data
+
+    def _inflate(self, size):
+        """Return up to size decompressed bytes, empty only at the end of the stream"""
+        while not self._decompressor.eof:
+            data = self._tail or self._read_raw(CHUNK_SIZE)
+            if not data:
+                raise ZipDataError(f"Truncated deflate stream: {self.name}")
+            try:
+                output = self._decompressor.decompress(data, size)
+            except zlib.error as e:
+                raise ZipDataError(f"Bad deflate stream: {self.name}: {e}")
+            self._tail = self._decompressor.unconsumed_tail
+            if output:
+                return output
+        return b''
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.size - self._position)
+        if size <= 0:
+            return 0
+        if self._decompressor:
+            data = self._inflate(size)
+            if not data:
+                raise ZipDataError(f"Bad CRC-32 or size: {self.name}")
+        else:
+            self._raw_position = self._position
+            data = self._read_raw(size)
+        buffer[:len(data)] = data
+        self._position += len(data)
+
+        # Only data read in order from the start can be checked
+        if self._checked is not None:
+            self._crc = zlib.crc32(data, self._crc)
+            self._checked = self._position
+            if self._position == self.size and self._crc != self._entry.crc:
+                raise ZipDataError(f"Bad CRC-32 or size: {self.name}")
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+def open_member(archive_path, name, listing=None):
+    """Open one ZIP member as a seekable binary stream
+
+    Pass the archive's ZipListing to skip reading the central directory
+    again. Raises KeyError if there is no member with that name and
+    UnsupportedMemberError if the member cannot be decompressed.
+    """
+    if listing is None:
+        listing = list_zip(archive_path)
+    try:
+        entry = listing[listing.names.index(name)]
+    except ValueError:
+        raise KeyError(f"No member named {name} in {archive_path}")
+
+    f = open(archive_path, 'rb')
+    try:
+        return io.BufferedReader(ZipMemberReader(f, entry), CHUNK_SIZE)
+    except BaseException:
+        f.close()
+        raise
+
+def extract_members(archive_path, names, destination):
+    """Extract the named members only, returns the number extracted"""
+    listing = list_zip(archive_path)
+    destination = os.path.abspath(destination)
+    for name in names:
+        target = safe_member_path(destination, name)
+        if target is None:
+            continue
+        with open_member(archive_path, name, listing) as source:
+            if name.endswith('/'):
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as out:
+                shutil.copyfileobj(source, out, CHUNK_SIZE)
+    return len(names)
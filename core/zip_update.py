@@ -0,0 +1,225 @@
+"""
+Raw member copy for updating ZIP archives in HRNZipper
+Adds, replaces, deletes and merges members without recompressing the
+members that stay
+
+Untouched members are copied byte for byte, local header and data
+descriptor included, with copy_range where the kernel can do it. Only the
+central directory is written anew. Adding files to an archive whose members
+all stay is done in place: the new members go where the old central
+directory was, followed by the new directory.
+"""
+
+import os
+import mmap
+import tempfile
+from contextlib import ExitStack
+
+from core.zip_extract import copy_range
+from core.zip_listing import (
+    CENTRAL_HEADER, EOCD, LOCAL_HEADER_SIGNATURE, UTF8_FLAG, ZipDataError, ZipListingError,
+    _apply_zip64_extra, _find_eocd, _read_directory_location, _read_stored_offset,
+)
+from core.zip_writer import (
+    CentralRecord, collect_inputs, compression_level_of, skip_path, strip_zip64_extra,
+    write_central_directory, write_members,
+)
+
+class _Source:
+    """A mapped archive with its central directory records and member spans"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self.file.close()
+            raise ZipListingError("End of central directory record not found")
+        try:
+            self.records, self.cd_start, self.comment = read_central_records(self.data)
+            self.spans = _member_spans(self.data, self.records, self.cd_start)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+def member_name(record):
+    """Return the decoded name of a CentralRecord"""
+    return record.name.decode('utf-8' if record.flags & UTF8_FLAG else 'cp437')
+
+def read_central_records(data):
+    """Return (records, directory start, archive comment) of a mapped ZIP archive
+
+    Header offsets in the records are positions in the file, so data
+    prepended to the archive is already accounted for.
+    """
+    eocd_position = _find_eocd(data)
+    count, cd_size, cd_end = _read_directory_location(data, eocd_position)
+    cd_start = cd_end - cd_size
+    concat = cd_start - _read_stored_offset(data, eocd_position, cd_end)
+    if cd_start < 0 or concat < 0:
+        raise ZipListingError("Bad central directory offset")
+    comment_start = eocd_position + EOCD.size
+    comment = bytes(data[comment_start:comment_start + EOCD.unpack_from(data, eocd_position)[7]])
+
+    records = []
+    position = cd_start
+    for _ in range(count):
+        if position + CENTRAL_HEADER.size > cd_end:
+            raise ZipListingError("Truncated central directory")
+        (signature, version_made_by, version_needed, flags, method, dos_time, dos_date, crc,
+         compressed_size, size, name_length, extra_length, comment_length, _, internal_attr,
+         external_attr, header_offset) = CENTRAL_HEADER.unpack_from(data, position)
+        if signature != b'PK\x01\x02':
+            raise ZipListingError("Bad central directory file header")
+        name_start = position + CENTRAL_HEADER.size
+        extra_start = name_start + name_length
+        member_comment_start = extra_start + extra_length
+        position = member_comment_start + comment_length
+        if position > cd_end:
+            raise ZipListingError("Truncated central directory")
+
+        extra = bytes(data[extra_start:member_comment_start])
+        size, compressed_size, header_offset = _apply_zip64_extra(
+            extra, size, compressed_size, header_offset)
+        records.append(CentralRecord(
+            name=bytes(data[name_start:extra_start]), flags=flags, method=method,
+            dos_time=dos_time, dos_date=dos_date, crc=crc, compressed_size=compressed_size,
+            size=size, header_offset=header_offset + concat, external_attr=external_attr,
+            version_made_by=version_made_by, version_needed=version_needed,
+            extra=strip_zip64_extra(extra), comment=bytes(data[member_comment_start:position]),
+            internal_attr=internal_attr,
+        ))
+    return records, cd_start, comment
+
+def _member_spans(data, records, cd_start):
+    """Return the (start, end) of every member's local header, data and data descriptor
+
+    A member runs up to the next member or the central directory, which
+    takes in a data descriptor without having to parse it.
+    """
+    starts = sorted({record.header_offset for record in records})
+    ends = dict(zip(starts, starts[1:] + [cd_start]))
+    spans = []
+    for record in records:
+        start = record.header_offset
+        if data[start:start + 4] != LOCAL_HEADER_SIGNATURE:
+            raise ZipDataError(f"Bad local file header: {member_name(record)}")
+        spans.append((start, ends[start]))
+    return spans
+
+def _copy_member(source, f, record, span):
+    """Copy one member verbatim to the current position of f, return its record there"""
+    start, end = span
+    offset = f.tell()
+    f.flush()
+    if copy_range(source.file.fileno(), f.fileno(), start, end - start):
+        f.seek(offset + end - start)
+    else:
+        with memoryview(source.data) as view, view[start:end] as member:
+            f.write(member)
+    return record._replace(header_offset=offset)
+
+def _rebuild(archive_path, sources, members, items=(), level=None, workers=None, comment=b''):
+    """Write a new archive from (source, record, span) members and new inputs, then move it into place
+
+    The sources are closed before the archive is replaced, Windows cannot
+    replace a file that is still mapped. Returns the records of the new inputs.
+    """
+    archive_path = os.path.abspath(archive_path)
+    fd, temp_path = tempfile.mkstemp(prefix='.hrnzipper-', suffix='.tmp',
+                                     dir=os.path.dirname(archive_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            records = [_copy_member(source, f, record, span) for source, record, span in members]
+            added = write_members(f, skip_path(items, temp_path), level, workers)
+            write_central_directory(f, records + added, comment)
+        for source in sources:
+            source.close()
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return added
+
+def delete_members(archive_path, names):
+    """Remove the named members from a ZIP archive, copying the others verbatim
+
+    Raises KeyError if a name is not in the archive. Returns the number of
+    members removed.
+    """
+    names = set(names)
+    source = _Source(archive_path)
+    try:
+        present = {member_name(record) for record in source.records}
+        missing = names - present
+        if missing:
+            raise KeyError(f"No member named {sorted(missing)[0]} in {archive_path}")
+        kept = [(source, record, span) for record, span in zip(source.records, source.spans)
+                if member_name(record) not in names]
+        _rebuild(archive_path, [source], kept, comment=source.comment)
+        return len(source.records) - len(kept)
+    finally:
+        source.close()
+
+def update(archive_path, files, compression_level=None, workers=None):
+    """Add files and folders to a ZIP archive, replacing members with the same names
+
+    Members that stay are not recompressed. When no member is replaced the
+    new members are appended in place. Returns the number of members added.
+    """
+    level = compression_level_of(compression_level)
+    archive_path = os.path.abspath(archive_path)
+    items = list(skip_path(collect_inputs(files), archive_path))
+    names = {item.arcname for item in items}
+
+    source = _Source(archive_path)
+    try:
+        kept = [(source, record, span) for record, span in zip(source.records, source.spans)
+                if member_name(record) not in names]
+        if len(kept) < len(source.records):
+            return len(_rebuild(archive_path, [source], kept, items, level, workers, source.comment))
+        records, cd_start, comment = source.records, source.cd_start, source.comment
+        # Restores the archive if writing the new members fails
+        old_tail = source.data[cd_start:]
+    finally:
+        source.close()
+
+    with open(archive_path, 'r+b') as f:
+        f.seek(cd_start)
+        try:
+            added = write_members(f, items, level, workers)
+            write_central_directory(f, records + added, comment)
+            f.truncate()
+        except BaseException:
+            f.seek(cd_start)
+            f.write(old_tail)
+            f.truncate()
+            raise
+    return len(added)
+
+def merge(archive_path, sources):
+    """Create a ZIP archive holding the members of every source archive
+
+    Members are copied verbatim. A member of a later source replaces a member
+    with the same name from an earlier one. The target may be one of the
+    sources. Returns the number of members in the merged archive.
+    """
+    with ExitStack() as stack:
+        members = {}
+        opened = []
+        for path in sources:
+            source = _Source(path)
+            stack.callback(source.close)
+            opened.append(source)
+            for record, span in zip(source.records, source.spans):
+                members[member_name(record)] = (source, record, span)
+        _rebuild(archive_path, opened, list(members.values()))
+        return len(members)
@@ -0,0 +1,387 @@
+"""
+Parallel ZIP writer for HRNZipper
+Compresses members on a thread pool and writes the finished members to the
+archive in their original order. zlib releases the GIL while it compresses,
+so the work spreads over all cores.
+
+Members larger than ``CHUNK_SIZE`` are split pigz-style: every chunk is
+compressed on its own with the preceding 32 KiB as its dictionary and ends
+on a sync flush, so the chunks join into one valid deflate stream. The chunk
+CRCs are joined with crc32_combine.
+
+Whether a member is deflated or stored is decided per file by
+core.method_selector, so photos, video and archives are not compressed
+again. Single-chunk members are checked on the worker, from the data it
+reads anyway.
+"""
+
+import os
+import sys
+import stat
+import time
+import zlib
+import struct
+import tempfile
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from core.method_selector import read_head, should_compress
+from core.walker import Walker
+from core.zip_listing import (
+    CENTRAL_HEADER, EOCD, EOCD_SIGNATURE, LOCAL_HEADER, LOCAL_HEADER_SIGNATURE,
+    UTF8_FLAG, ZIP64_EOCD, ZIP64_EOCD_SIGNATURE, ZIP64_EXTRA_ID, ZIP64_LOCATOR,
+    ZIP64_LOCATOR_SIGNATURE, ZIP64_PLACEHOLDER,
+)
+
+STORED = 0
+DEFLATED = 8
+
+# Members are read and compressed in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+DICTIONARY_SIZE = 32 * 1024
+
+# Values from this size on need ZIP64 fields
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+CREATE_SYSTEM = 0 if sys.platform == 'win32' else 3
+DIRECTORY_ATTRIBUTE = 0x10
+
+# Everything the central directory records about one member
+CentralRecord = namedtuple('CentralRecord', [
+    'name', 'flags', 'method', 'dos_time', 'dos_date', 'crc', 'compressed_size',
+    'size', 'header_offset', 'external_attr', 'version_made_by', 'version_needed',
+    'extra', 'comment', 'internal_attr',
+])
+
+# One input file or folder and its name inside the archive
+ZipInput = namedtuple('ZipInput', ['path', 'arcname', 'stat'])
+
+def _gf2_times(matrix, vector):
+    total = 0
+    for row in matrix:
+        if not vector:
+            break
+        if vector & 1:
+            total ^= row
+        vector >>= 1
+    return total
+
+def _gf2_compose(outer, inner):
+    return [_gf2_times(outer, row) for row in inner]
+
+@lru_cache(maxsize=64)
+def _zeros_operator(length):
+    """Return the GF(2) matrix that feeds ``length`` zero bytes through a CRC-32"""
+    power = [0xEDB88320] + [1 << n for n in range(31)]
+    for _ in range(3):
+        power = _gf2_compose(power, power)
+    result = None
+    while length:
+        if length & 1:
+            result = power if result is None else _gf2_compose(power, result)
+        length >>= 1
+        if length:
+            power = _gf2_compose(power, power)
+    return result
+
+def crc32_combine(crc1, crc2, length2):
+    """Return the CRC-32 of two joined blocks from their CRCs and the second length"""
+    if not length2:
+        return crc1
+    return _gf2_times(_zeros_operator(length2), crc1) ^ crc2
+
+def dos_date_time(timestamp):
+    """Return the (time, date) MS-DOS fields for a timestamp, clamped to 1980-2107"""
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    elif year > 2107:
+        year, month, day, hour, minute, second = 2107, 12, 31, 23, 59, 58
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+def encode_name(name):
+    """Return the encoded member name and the flag bits it needs"""
+    try:
+        return name.encode('ascii'), 0
+    except UnicodeEncodeError:
+        return name.encode('utf-8'), UTF8_FLAG
+
+def strip_zip64_extra(extra):
+    """Remove the ZIP64 field from an extra field, it is rebuilt when needed"""
+    kept = []
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, field_size = struct.unpack_from('<2H', extra, position)
+        end = position + 4 + field_size
+        if field_id != ZIP64_EXTRA_ID:
+            kept.append(extra[position:end])
+        position = end
+    return b''.join(kept)
+
+def build_central_header(record):
+    """Return the central directory header of a member, with ZIP64 fields as needed"""
+    size, compressed_size, header_offset = record.size, record.compressed_size, record.header_offset
+    values = []
+    if size >= ZIP64_LIMIT:
+        values.append(size)
+        size = ZIP64_PLACEHOLDER
+    if compressed_size >= ZIP64_LIMIT:
+        values.append(compressed_size)
+        compressed_size = ZIP64_PLACEHOLDER
+    if header_offset >= ZIP64_LIMIT:
+        values.append(header_offset)
+        header_offset = ZIP64_PLACEHOLDER
+
+    extra = strip_zip64_extra(record.extra)
+    version_needed = record.version_needed
+    version_made_by = record.version_made_by
+    if values:
+        extra = struct.pack(f'<2H{len(values)}Q', ZIP64_EXTRA_ID, 8 * len(values), *values) + extra
+        version_needed = max(version_needed, VERSION_ZIP64)
+        version_made_by = (version_made_by & 0xFF00) | max(version_made_by & 0xFF, VERSION_ZIP64)
+
+    return CENTRAL_HEADER.pack(
+        b'PK\x01\x02', version_made_by, version_needed, record.flags, record.method,
+        record.dos_time, record.dos_date, record.crc, compressed_size, size,
+        len(record.name), len(extra), len(record.comment), 0, record.internal_attr,
+        record.external_attr, header_offset,
+    ) + record.name + extra + record.comment
+
+def write_central_directory(f, records, comment=b''):
+    """Write the central directory and end records for the given members at the current position"""
+    cd_offset = f.tell()
+    for record in records:
+        f.write(build_central_header(record))
+    cd_size = f.tell() - cd_offset
+    count = len(records)
+
+    if count >= ZIP_FILECOUNT_LIMIT or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+        zip64_offset = f.tell()
+        f.write(ZIP64_EOCD.pack(ZIP64_EOCD_SIGNATURE, ZIP64_EOCD.size - 12, VERSION_ZIP64,
+                                VERSION_ZIP64, 0, 0, count, count, cd_size, cd_offset))
+        f.write(ZIP64_LOCATOR.pack(ZIP64_LOCATOR_SIGNATURE, 0, zip64_offset, 1))
+    f.write(EOCD.pack(EOCD_SIGNATURE, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                      min(cd_size, ZIP64_PLACEHOLDER), min(cd_offset, ZIP64_PLACEHOLDER),
+                      len(comment)))
+    f.write(comment)
+
+def collect_inputs(files, walker=None):
+    """Yield a ZipInput for every file and folder, folders before their contents
+
+    Names inside the archive are relative to the folder holding each given
+    path, so adding ``docs`` stores ``docs/...``. Folders are scanned in
+    parallel by a core.walker.Walker, pass one to follow its counts.
+    """
+    walker = walker or Walker()
+    for top in files:
+        for entry in walker.walk(top):
+            is_dir = stat.S_ISDIR(entry.stat.st_mode)
+            yield ZipInput(entry.path, entry.name + '/' if is_dir else entry.name, entry.stat)
+
+def _read_exactly(f, offset, length):
+    f.seek(offset)
+    data = f.read(length)
+    if len(data) != length:
+        raise OSError(f"File changed while it was being archived: {f.name}")
+    return data
+
+def _compress_chunk(path, offset, length, method, level, last):
+    """Read and compress one chunk of a member, return (data, crc, length, method)
+
+    A method of None picks stored or deflate from the data of a member that
+    is a single chunk.
+    """
+    with open(path, 'rb') as f:
+        data = _read_exactly(f, offset, length)
+        if method is None:
+            method = DEFLATED if should_compress(path, data) else STORED
+        if method == STORED:
+            return data, zlib.crc32(data), length, method
+        if offset:
+            start = max(0, offset - DICTIONARY_SIZE)
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15,
+                                          zdict=_read_exactly(f, start, offset - start))
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.crc32(data), length, method
+
+class _Member:
+    """A member whose chunks are being compressed"""
+
+    def __init__(self, item, method, zip64):
+        self.item = item
+        self.name, self.flags = encode_name(item.arcname)
+        self.method = method
+        self.zip64 = zip64
+        self.chunks = []
+
+def compression_level_of(compression_level):
+    """Return the zlib level for a compression_level argument, raising ValueError if invalid"""
+    level = zlib.Z_DEFAULT_COMPRESSION if compression_level is None else compression_level
+    if not -1 <= level <= 9:
+        raise ValueError(f"Invalid compression level: {compression_level}")
+    return level
+
+def write_members(f, items, level, workers=None, cancel=None):
+    """Compress ZipInputs on a thread pool and write them at the current position
+
+    ``cancel`` is an optional core.scheduler.CancelToken, checked before
+    every member and chunk. Returns the CentralRecord of every member
+    written, in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = workers * 4
+    records = []
+    pending = deque()
+    in_flight = 0
+
+    with ThreadPoolExecutor(workers) as executor:
+        for item in items:
+            if cancel is not None:
+                cancel.check()
+            member = _schedule(executor, item, level)
+            pending.append(member)
+            in_flight += len(member.chunks)
+            # Bound the memory held by compressed chunks waiting to be written
+            while in_flight > window and len(pending) > 1:
+                done = pending.popleft()
+                in_flight -= len(done.chunks)
+                records.append(_write_member(f, done, cancel))
+
+        while pending:
+            records.append(_write_member(f, pending.popleft(), cancel))
+    return records
+
+def write_zip(archive_path, files, compression_level=None, workers=None, cancel=None):
+    """Create a ZIP archive from the given files and folders
+
+    ``compression_level`` 0 stores every member, 1-9 deflates at that level
+    and None uses the zlib default. Returns the number of members written.
+    The archive is written to a temporary file next to the target and moved
+    into place once complete, a cancelled or failed run leaves nothing behind.
+    """
+    return write_inputs(archive_path, collect_inputs(files), compression_level, workers, cancel)
+
+def write_inputs(archive_path, items, compression_level=None, workers=None, cancel=None):
+    """Create a ZIP archive from ZipInputs, see write_zip"""
+    level = compression_level_of(compression_level)
+
+    archive_path = os.path.abspath(archive_path)
+    fd, temp_path = tempfile.mkstemp(prefix='.hrnzipper-', suffix='.tmp',
+                                     dir=os.path.dirname(archive_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            records = write_members(f, skip_path(items, temp_path), level, workers, cancel)
+            write_central_directory(f, records)
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(records)
+
+def skip_path(items, path):
+    """Leave out the input at path, the temporary archive is inside the tree when archiving its own folder"""
+    for item in items:
+        if os.path.normcase(item.path) != os.path.normcase(path):
+            yield item
+
+def _schedule(executor, item, level):
+    """Submit the chunks of one member to the pool"""
+    if stat.S_ISDIR(item.stat.st_mode):
+        return _Member(item, STORED, False)
+
+    size = item.stat.st_size
+    # Compressed data can end up slightly larger than the input
+    zip64 = size * 1.05 + 1024 >= ZIP64_LIMIT
+    offsets = range(0, size, CHUNK_SIZE) if size else [0]
+    if level == 0:
+        method = STORED
+    elif len(offsets) == 1 and not zip64:
+        method = None
+    else:
+        # Chunks are compressed independently, so larger members are decided up front
+        method = DEFLATED if should_compress(item.path, read_head(item.path)) else STORED
+    member = _Member(item, method, zip64)
+    for offset in offsets:
+        length = min(CHUNK_SIZE, size - offset)
+        last = offset + length >= size
+        member.chunks.append(executor.submit(
+            _compress_chunk, item.path, offset, length, method, level, last))
+    return member
+
+def _write_chunks(f, member, header_offset, version, dos_time, dos_date, cancel=None):
+    """Write a member chunk by chunk and fill in its header afterwards, return (crc, size, compressed size)"""
+    extra = struct.pack('<2H2Q', ZIP64_EXTRA_ID, 16, 0, 0) if member.zip64 else b''
+    f.write(LOCAL_HEADER.pack(LOCAL_HEADER_SIGNATURE, version, member.flags, member.method,
+                              dos_time, dos_date, 0, 0, 0, len(member.name), len(extra)))
+    f.write(member.name)
+    f.write(extra)
+
+    crc = 0
+    size = 0
+    compressed_size = 0
+    for future in member.chunks:
+        if cancel is not None:
+            cancel.check()
+        data, chunk_crc, length, _ = future.result()
+        f.write(data)
+        crc = crc32_combine(crc, chunk_crc, length) if size else chunk_crc
+        size += length
+        compressed_size += len(data)
+
+    end = f.tell()
+    if member.zip64:
+        f.seek(header_offset + 14)
+        f.write(struct.pack('<3L', crc, ZIP64_PLACEHOLDER, ZIP64_PLACEHOLDER))
+        f.seek(header_offset + LOCAL_HEADER.size + len(member.name) + 4)
+        f.write(struct.pack('<2Q', size, compressed_size))
+    else:
+        f.seek(header_offset + 14)
+        f.write(struct.pack('<3L', crc, compressed_size, size))
+    f.seek(end)
+    return crc, size, compressed_size
+
+def _write_member(f, member, cancel=None):
+    """Write one member's local header and data, return its CentralRecord"""
+    item = member.item
+    is_dir = stat.S_ISDIR(item.stat.st_mode)
+    dos_time, dos_date = dos_date_time(item.stat.st_mtime)
+    single = len(member.chunks) <= 1 and not member.zip64
+    if single and member.chunks:
+        # The worker picks the method of single-chunk members
+        data, crc, size, member.method = member.chunks[0].result()
+    elif single:
+        data, crc, size = b'', 0, 0
+    version = VERSION_ZIP64 if member.zip64 else (VERSION_DEFAULT if member.method == DEFLATED or is_dir else 10)
+
+    header_offset = f.tell()
+    if single:
+        # Folders and single-chunk members are written with their final header
+        compressed_size = len(data)
+        f.write(LOCAL_HEADER.pack(LOCAL_HEADER_SIGNATURE, version, member.flags, member.method,
+                                  dos_time, dos_date, crc, compressed_size, size,
+                                  len(member.name), 0))
+        f.write(member.name)
+        f.write(data)
+    else:
+        crc, size, compressed_size = _write_chunks(f, member, header_offset, version,
+                                                   dos_time, dos_date, cancel)
+
+    external_attr = (item.stat.st_mode & 0xFFFF) << 16
+    if is_dir:
+        external_attr |= DIRECTORY_ATTRIBUTE
+    return CentralRecord(
+        name=member.name, flags=member.flags, method=member.method, dos_time=dos_time,
+        dos_date=dos_date, crc=crc, compressed_size=compressed_size, size=size,
+        header_offset=header_offset, external_attr=external_attr,
+        version_made_by=(CREATE_SYSTEM << 8) | max(version, VERSION_DEFAULT),
+        version_needed=version, extra=b'', comment=b'', internal_attr=0,
+    )
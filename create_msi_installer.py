@@ -61,8 +61,9 @@ cd /d "%~dp0"
 python main.py %*
 '''
                 os.makedirs("dist", exist_ok=True)
-                with open("dist/HRNZipper.exe", 'w') as f:
-                    f.write(exe_content)
+                for exe_name in ["HRNZipper.exe", "HRNZipper-cli.exe"]:
+                    with open(f"dist/{exe_name}", 'w') as f:
+                        f.write(exe_content)
                 return True
             else:
                 print(f"✗ Build failed: {result.stderr}")
@@ -140,6 +141,9 @@ python main.py %*
                         </Extension>
                     </ProgId>
                 </File>
+                <File Id="HRNZipperCLI"
+                      Source="dist\\HRNZipper-cli.exe"
+                      Name="HRNZipper-cli.exe" />
             </Component>
             
             <!-- Additional Resources -->
@@ -477,6 +481,7 @@ Section "Install"
     
     ; Install main executable
     File "dist\\HRNZipper.exe"
+    File "dist\\HRNZipper-cli.exe"
     File "README.md"
     File "LICENSE.txt"
     
@@ -517,6 +522,7 @@ SectionEnd
 
 Section "Uninstall"
     Delete "$INSTDIR\\HRNZipper.exe"
+    Delete "$INSTDIR\\HRNZipper-cli.exe"
     Delete "$INSTDIR\\README.md"
     Delete "$INSTDIR\\LICENSE.txt"
     Delete "$INSTDIR\\uninstall.exe"
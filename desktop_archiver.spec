@@ -56,3 +56,52 @@ exe = EXE(
     icon='resources/app_icon.ico',
     version='version_info.txt',
 )
+
+# Console build of the same entry point for batch scripts: cmd.exe waits for
+# it, and it has stdout/stderr for listings and errors. Qt is left out so the
+# one-file exe unpacks and starts quickly.
+cli_a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[
+        'cryptography',
+        'py7zr',
+        'rarfile',
+    ],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['PyQt5', 'PIL', 'psutil'],
+    win_no_prefer_redirects=False,
+    win_private_assemblies=False,
+    cipher=block_cipher,
+    noarchive=False,
+)
+
+cli_pyz = PYZ(cli_a.pure, cli_a.zipped_data, cipher=block_cipher)
+
+cli_exe = EXE(
+    cli_pyz,
+    cli_a.scripts,
+    cli_a.binaries,
+    cli_a.zipfiles,
+    cli_a.datas,
+    [],
+    name='HRNZipper-cli',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='resources/app_icon.ico',
+    version='version_info.txt',
+)
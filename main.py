@@ -3,24 +3,70 @@
 HRNZipper - Main Application Entry Point
 A feature-rich desktop archiver with modern PyQt GUI supporting multiple formats
 By Harun Softwares
+
+Running ``hrnzipper create|extract|list|test|update|delete|merge ...``
+executes the archive operation headless, without importing PyQt5 or starting
+the GUI.
+Pass ``--profile-startup`` to print a per-phase GUI startup time breakdown.
 """
 
 import sys
 import os
+import time
 import logging
-from PyQt5.QtWidgets import QApplication, QStyleFactory
-from PyQt5.QtCore import Qt, QDir, QStandardPaths
-from PyQt5.QtGui import QIcon, QPixmap
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from gui.main_window import MainWindow
-from utils.config_manager import ConfigManager
-from utils.logger import setup_logging
+# Sub-commands handled without the GUI
+HEADLESS_COMMANDS = ('create', 'extract', 'list', 'test', 'update', 'delete', 'merge')
+
+# Exit codes of the headless sub-commands, argparse uses 2 for usage errors
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_NOT_FOUND = 3
+
+class StartupProfiler:
+    """Record how long each GUI startup phase takes"""
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+        self.reported = False
+        self._last = time.perf_counter()
+    
+    def mark(self, phase):
+        """Close the current phase under the given name"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+    
+    def report(self):
+        """Log the phase breakdown once if profiling is enabled
+        
+        The breakdown goes to the log file and, when there is a console, to stderr.
+        """
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        
+        total = sum(duration for _, duration in self.phases)
+        lines = ["HRNZipper startup profile:"]
+        for phase, duration in self.phases:
+            lines.append(f"  {phase:<16}{duration * 1000:9.1f} ms")
+        lines.append(f"  {'total':<16}{total * 1000:9.1f} ms")
+        
+        logging.getLogger(__name__).info('\n'.join(lines))
+        # The windowed build has no stderr
+        if sys.stderr is not None:
+            print('\n'.join(lines), file=sys.stderr)
 
 def setup_application():
     """Initialize the application with proper settings"""
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QIcon
+    
     # Enable high DPI scaling BEFORE creating QApplication
     try:
         QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
@@ -47,6 +93,8 @@ def setup_application():
 
 def setup_directories():
     """Create necessary application directories"""
+    from PyQt5.QtCore import QStandardPaths
+    
     config_dir = QStandardPaths.writableLocation(QStandardPaths.AppConfigLocation)
     cache_dir = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
     
@@ -54,27 +102,386 @@ def setup_directories():
         if not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
 
+def build_cli_parser():
+    """Build the argument parser for the headless sub-commands"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog='hrnzipper',
+        description='HRNZipper command line archive operations'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    create_parser = subparsers.add_parser('create', help='Create an archive')
+    create_parser.add_argument('archive', help='Archive file to create')
+    create_parser.add_argument('files', nargs='+', help='Files and folders to add')
+    create_parser.add_argument('-l', '--level', type=int, help='Compression level')
+    create_parser.add_argument('-p', '--password', help='Archive password')
+    create_parser.add_argument('--manifest', action='store_true',
+                               help='Save a ZIP manifest so later runs can be incremental')
+    create_parser.add_argument('--base',
+                               help='Only archive what changed since this incremental ZIP archive')
+    create_parser.add_argument('--queue', action='store_true',
+                               help='Hand the job to a running HRNZipper window if there is one')
+    
+    extract_parser = subparsers.add_parser('extract', help='Extract an archive')
+    extract_parser.add_argument('archive', help='Archive file to extract')
+    extract_parser.add_argument('destination', nargs='?',
+                                help='Destination folder (defaults to the archive folder)')
+    extract_parser.add_argument('-p', '--password', help='Archive password')
+    extract_parser.add_argument('-m', '--member', action='append', dest='members',
+                                help='Extract only this member, may be repeated')
+    extract_parser.add_argument('--queue', action='store_true',
+                                help='Hand the job to a running HRNZipper window if there is one')
+    
+    list_parser = subparsers.add_parser('list', help='List archive contents')
+    list_parser.add_argument('archive', help='Archive file to list')
+    list_parser.add_argument('-p', '--password', help='Archive password')
+    
+    test_parser = subparsers.add_parser('test', help='Test archive integrity')
+    test_parser.add_argument('archive', help='Archive file to test')
+    test_parser.add_argument('-p', '--password', help='Archive password')
+    
+    update_parser = subparsers.add_parser('update', help='Add or replace files in a ZIP archive')
+    update_parser.add_argument('archive', help='Archive file to update')
+    update_parser.add_argument('files', nargs='+', help='Files and folders to add')
+    update_parser.add_argument('-l', '--level', type=int, help='Compression level')
+    update_parser.add_argument('-p', '--password', help='Archive password')
+    update_parser.add_argument('--queue', action='store_true',
+                               help='Hand the job to a running HRNZipper window if there is one')
+    
+    # Members are copied without decrypting them, so no password is needed
+    delete_parser = subparsers.add_parser('delete', help='Delete members from a ZIP archive')
+    delete_parser.add_argument('archive', help='Archive file to delete from')
+    delete_parser.add_argument('members', nargs='+', help='Member names to delete')
+    delete_parser.add_argument('--queue', action='store_true',
+                               help='Hand the job to a running HRNZipper window if there is one')
+    delete_parser.set_defaults(password=None)
+    
+    merge_parser = subparsers.add_parser('merge', help='Merge ZIP archives into one')
+    merge_parser.add_argument('archive', help='Archive file to create')
+    merge_parser.add_argument('sources', nargs='+', help='ZIP archives to merge, later ones win')
+    merge_parser.add_argument('--queue', action='store_true',
+                              help='Hand the job to a running HRNZipper window if there is one')
+    merge_parser.set_defaults(password=None)
+    
+    return parser
+
+def is_zip(args):
+    """Whether the sub-command works on a ZIP archive"""
+    return args.archive.lower().endswith('.zip')
+
+def is_compressed_tar(args):
+    """Whether the sub-command works on a TAR.GZ or TAR.BZ2 archive"""
+    return args.archive.lower().endswith(('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tbz'))
+
+def is_dedup(args):
+    """Whether the sub-command works on an HRNZipper dedup archive"""
+    return args.archive.lower().endswith('.hrnd')
+
+def run_dedup_command(args, archive, cwd):
+    """Run a create, extract, list or test sub-command on a dedup archive"""
+    from core import dedup_store
+    
+    if args.password or getattr(args, 'members', None) or getattr(args, 'manifest', False) \
+            or getattr(args, 'base', None):
+        logging.getLogger(__name__).error("Dedup archives support no password, --member, --manifest or --base")
+        return EXIT_FAILED
+    if args.command == 'create':
+        files = [os.path.join(cwd, path) for path in args.files]
+        dedup_store.create_store(archive, files, compression_level=args.level)
+    elif args.command == 'extract':
+        destination = os.path.join(cwd, args.destination) if args.destination else os.path.dirname(archive)
+        dedup_store.extract_store(archive, destination)
+    elif args.command == 'list':
+        names = dedup_store.list_store(archive)
+        if names:
+            print('\n'.join(names))
+    elif not dedup_store.verify_store(archive):
+        logging.getLogger(__name__).error(f"Archive is damaged: {archive}")
+        return EXIT_FAILED
+    return EXIT_OK
+
+def run_command(manager, args, cwd=None, cancel=None):
+    """Run a parsed archive sub-command
+    
+    ``manager`` is the ArchiveManager to use, or None to build one only if
+    the command needs it. ``cancel`` is a core.scheduler.CancelToken that
+    ZIP creation and extraction check between chunks.
+    """
+    logger = logging.getLogger(__name__)
+    
+    def archive_manager():
+        nonlocal manager
+        if manager is None:
+            from core.archive_manager import ArchiveManager
+            manager = ArchiveManager()
+        return manager
+    
+    cwd = cwd or os.getcwd()
+    archive = os.path.join(cwd, args.archive)
+    
+    if args.command not in ('create', 'merge') and not os.path.isfile(archive):
+        logger.error(f"Archive not found: {archive}")
+        return EXIT_NOT_FOUND
+    
+    options = {}
+    if args.password:
+        options['password'] = args.password
+    
+    try:
+        if is_dedup(args) and args.command in ('create', 'extract', 'list', 'test'):
+            return run_dedup_command(args, archive, cwd)
+        if args.command == 'create':
+            if args.level is not None:
+                options['compression_level'] = args.level
+            files = [os.path.join(cwd, path) for path in args.files]
+            incremental = args.manifest or args.base
+            if incremental and (not is_zip(args) or args.password):
+                logger.error("--manifest and --base need an unencrypted ZIP archive")
+                return EXIT_FAILED
+            if incremental:
+                from core.manifest import create_incremental
+                base = os.path.join(cwd, args.base) if args.base else None
+                result, _ = create_incremental(archive, files, base, compression_level=args.level)
+            elif is_zip(args) and not args.password:
+                # Unencrypted ZIPs are compressed on all cores
+                from core.zip_writer import write_zip
+                result = write_zip(archive, files, compression_level=args.level, cancel=cancel)
+            elif is_compressed_tar(args) and not args.password:
+                # Written with checkpoints for fast single member reads
+                from core.tar_index import write_tar
+                result = write_tar(archive, files, compression_level=args.level)
+            else:
+                result = archive_manager().create_archive(archive, files, **options)
+        elif args.command == 'extract':
+            destination = os.path.join(cwd, args.destination) if args.destination else os.path.dirname(archive)
+            result = None
+            if args.members:
+                # Single members are read through the central directory or
+                # from the nearest TAR checkpoint
+                if is_zip(args) and not args.password:
+                    from core.zip_reader import extract_members
+                elif is_compressed_tar(args):
+                    from core.tar_index import extract_members
+                else:
+                    logger.error("--member needs an unencrypted ZIP, TAR.GZ or TAR.BZ2 archive")
+                    return EXIT_FAILED
+                result = extract_members(archive, args.members, destination)
+            elif is_zip(args) and not args.password:
+                # Unencrypted ZIPs are decompressed on all cores
+                from core.zip_listing import ZipListingError
+                from core.zip_extract import extract_zip
+                from core.manifest import has_base, restore
+                try:
+                    if has_base(archive):
+                        # Incremental archives are restored with their base archives
+                        result = restore(archive, destination)
+                    else:
+                        result = extract_zip(archive, destination, cancel=cancel)
+                except ZipListingError as e:
+                    logger.info(f"Extracting {archive} through ArchiveManager: {e}")
+            if result is None:
+                result = archive_manager().extract_archive(archive, destination, **options)
+        elif args.command == 'list':
+            names = None
+            if is_zip(args):
+                # ZIP names come straight from the central directory
+                from core.zip_listing import ZipListingError, list_zip
+                try:
+                    names = list_zip(archive).names
+                except ZipListingError as e:
+                    logger.info(f"Listing {archive} through ArchiveManager: {e}")
+            if names is None:
+                names = [entry.get('name', entry) if isinstance(entry, dict) else entry
+                         for entry in archive_manager().list_archive(archive, **options)]
+            if names:
+                print('\n'.join(map(str, names)))
+            return EXIT_OK
+        elif args.command == 'test':
+            result = archive_manager().test_archive(archive, **options)
+        else:
+            # Members are copied verbatim, only the central directory is rewritten
+            if not is_zip(args) or args.password:
+                logger.error(f"{args.command} needs an unencrypted ZIP archive")
+                return EXIT_FAILED
+            from core import zip_update
+            if args.command == 'update':
+                files = [os.path.join(cwd, path) for path in args.files]
+                result = zip_update.update(archive, files, compression_level=args.level)
+            elif args.command == 'delete':
+                result = zip_update.delete_members(archive, args.members)
+            else:
+                sources = [os.path.join(cwd, path) for path in args.sources]
+                result = zip_update.merge(archive, sources)
+    except Exception as e:
+        if cancel is not None and cancel.cancelled:
+            logger.info(f"{args.command} cancelled: {archive}")
+        else:
+            logger.error(f"{args.command} failed: {e}")
+        return EXIT_FAILED
+    
+    # Operations report failure either by raising or by returning False
+    return EXIT_FAILED if result is False else EXIT_OK
+
+def run_headless(argv):
+    """Run an archive sub-command without importing PyQt5"""
+    args = build_cli_parser().parse_args(argv)
+    
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    
+    if getattr(args, 'queue', False):
+        from utils.single_instance import forward_to_instance
+        if forward_to_instance(argv):
+            return EXIT_OK
+    
+    return run_command(None, args)
+
+class ForwardedCommands:
+    """Runs sub-commands forwarded to this instance on a JobScheduler
+    
+    ``put((argv, cwd))`` queues a command line, ``join()`` waits for all of
+    them. All commands share one ArchiveManager, loaded by the first one.
+    """
+    
+    def __init__(self, scheduler):
+        import threading
+        
+        self.scheduler = scheduler
+        self._parser = build_cli_parser()
+        self._manager = None
+        self._manager_error = None
+        self._manager_lock = threading.Lock()
+    
+    def _archive_manager(self):
+        logger = logging.getLogger(__name__)
+        with self._manager_lock:
+            if self._manager is None and self._manager_error is None:
+                try:
+                    from core.archive_manager import ArchiveManager
+                    self._manager = ArchiveManager()
+                except Exception as e:
+                    # Later commands are skipped instead of retrying
+                    self._manager_error = e
+                    logger.error(f"Forwarded commands cannot run, ArchiveManager failed to load: {e}")
+            return self._manager
+    
+    def _run(self, argv, cwd, cancel):
+        logger = logging.getLogger(__name__)
+        try:
+            args = self._parser.parse_args(argv)
+            manager = self._archive_manager()
+            if manager is None:
+                logger.error(f"Skipped forwarded command: {argv}")
+            else:
+                run_command(manager, args, cwd, cancel)
+        except SystemExit:
+            logger.error(f"Invalid forwarded command: {argv}")
+        except Exception as e:
+            logger.error(f"Forwarded command failed: {argv}: {e}")
+        # Marks the job as cancelled rather than done
+        cancel.check()
+    
+    def put(self, job):
+        from core import scheduler
+        
+        argv, cwd = job
+        # Listings and tests are quick and someone is waiting on them
+        priority = {'list': scheduler.INTERACTIVE, 'test': scheduler.INTERACTIVE,
+                    'extract': scheduler.NORMAL}.get(argv[0], scheduler.BATCH)
+        # The archive decides which disk the command counts against
+        paths = [os.path.join(cwd, argv[1])] if len(argv) > 1 else []
+        return self.scheduler.submit(self._run, argv, cwd, priority=priority, paths=paths,
+                                     name=' '.join(argv[:2]))
+    
+    def join(self):
+        self.scheduler.join()
+    
+    def cancel_all(self):
+        self.scheduler.cancel_all()
+
+def start_command_worker():
+    """Start the workers that run sub-commands forwarded to this instance
+    
+    Returns a ForwardedCommands that accepts ``(argv, cwd)`` jobs. Listings
+    and tests run ahead of extractions, which run ahead of everything else.
+    """
+    from core.scheduler import JobScheduler
+    
+    return ForwardedCommands(JobScheduler())
+
+def create_instance_bridge(main_window, jobs):
+    """Create the object that delivers forwarded command lines to the GUI thread"""
+    from PyQt5.QtCore import QObject, pyqtSignal
+    
+    class InstanceBridge(QObject):
+        received = pyqtSignal(object)
+    
+    def handle(payload):
+        argv = payload.get('argv', [])
+        cwd = payload.get('cwd') or os.getcwd()
+        if argv and argv[0] in HEADLESS_COMMANDS:
+            jobs.put((argv, cwd))
+            return
+        
+        for arg in argv:
+            file_path = os.path.join(cwd, arg)
+            if os.path.exists(file_path):
+                main_window.open_file(file_path)
+        main_window.raise_()
+        main_window.activateWindow()
+    
+    bridge = InstanceBridge()
+    bridge.received.connect(handle)
+    return bridge
+
 def main():
     """Main application entry point"""
+    if len(sys.argv) > 1 and sys.argv[1] in HEADLESS_COMMANDS:
+        return run_headless(sys.argv[1:])
+    
+    profiler = StartupProfiler('--profile-startup' in sys.argv)
+    if profiler.enabled:
+        sys.argv.remove('--profile-startup')
+    
+    # Claim the single instance endpoint before any Qt import, or hand the
+    # command line to the instance that owns it and exit
+    from utils.single_instance import InstanceServer, forward_to_instance
+    server = InstanceServer()
+    if not server.start():
+        # The owner may still be starting up, give it a moment to listen
+        if forward_to_instance(sys.argv[1:], timeout=5):
+            return 0
+        server = None
+    profiler.mark('instance server')
+    
     try:
+        from utils.logger import setup_logging
+        
         # Setup logging
         setup_logging()
         logger = logging.getLogger(__name__)
         logger.info("Starting HRNZipper...")
+        profiler.mark('logging')
         
         # Create application directories
         setup_directories()
+        profiler.mark('directories')
         
         # Initialize PyQt application
         app = setup_application()
+        profiler.mark('qapplication')
         
         # Load configuration
+        from utils.config_manager import ConfigManager
         config = ConfigManager()
         
         # Apply theme
         theme = config.get_setting('appearance', 'theme', 'dark')
         if theme == 'fusion':
+            from PyQt5.QtWidgets import QStyleFactory
             app.setStyle(QStyleFactory.create('Fusion'))
+        profiler.mark('config')
         
         # Load stylesheet
         try:
@@ -82,23 +489,46 @@ def main():
                 app.setStyleSheet(f.read())
         except FileNotFoundError:
             logger.warning("Style sheet not found, using default theme")
+        profiler.mark('stylesheet')
         
         # Create and show main window
+        from gui.main_window import MainWindow
         main_window = MainWindow()
         main_window.show()
+        profiler.mark('window')
         
         # Handle command line arguments
         if len(sys.argv) > 1:
             file_path = sys.argv[1]
             if os.path.exists(file_path):
                 main_window.open_file(file_path)
+        profiler.mark('open_file')
         
+        # Deliver command lines from later launches, including any that
+        # arrived while the window was being built
+        if server:
+            commands = start_command_worker()
+            bridge = create_instance_bridge(main_window, commands)
+            server.set_handler(bridge.received.emit)
+            app.aboutToQuit.connect(server.stop)
+            app.aboutToQuit.connect(commands.cancel_all)
+        else:
+            logger.warning("Running without single instance support")
+        profiler.mark('instance bridge')
+        
+        profiler.report()
         logger.info("Application started successfully")
         return app.exec_()
         
     except Exception as e:
         logging.error(f"Critical error during startup: {e}")
+        if server:
+            server.stop()
         return 1
+    
+    finally:
+        # Also report the phases that completed when startup failed
+        profiler.report()
 
 if __name__ == '__main__':
     exit_code = main()
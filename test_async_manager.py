@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio archive facade
+"""
+
+import asyncio
+import threading
+import time
+
+from core.async_manager import AsyncArchiveManager
+
+
+class SlowArchiveManager:
+    """Blocking manager that tracks how many calls run at once"""
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def _work(self):
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.peak = max(cls.peak, cls.running)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.running -= 1
+
+    def create_archive(self, archive, files, **options):
+        self._work()
+        return (archive, files, options)
+
+    def list_archive(self, archive, **options):
+        self._work()
+        return iter(['a.txt', 'b.txt'])
+
+
+def test_jobs_are_bounded_and_do_not_block_the_loop():
+    manager = AsyncArchiveManager(max_jobs=2, manager_factory=SlowArchiveManager)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        tick_task = asyncio.create_task(ticker())
+        results = await asyncio.gather(*[
+            manager.acreate(f'{i}.zip', (f'file{i}',), compression_level=i) for i in range(6)
+        ])
+        entries = [entry async for entry in manager.alist('0.zip')]
+        tick_task.cancel()
+        return results, entries, ticks
+
+    results, entries, ticks = asyncio.run(run())
+
+    assert results[3] == ('3.zip', ['file3'], {'compression_level': 3})
+    assert entries == ['a.txt', 'b.txt']
+    assert SlowArchiveManager.peak == 2
+    # The event loop kept running while the blocking calls were in progress
+    assert ticks > 10
+
+
+def test_cancelled_jobs_hold_their_slot_until_the_thread_finishes():
+    class TrackedArchiveManager(SlowArchiveManager):
+        running = 0
+        peak = 0
+
+    manager = AsyncArchiveManager(max_jobs=2, manager_factory=TrackedArchiveManager)
+
+    async def run():
+        cancelled = [asyncio.create_task(manager.acreate(f'{i}.zip', ())) for i in range(4)]
+        await asyncio.sleep(0.01)
+        for task in cancelled:
+            task.cancel()
+        await asyncio.gather(*cancelled, return_exceptions=True)
+
+        # The threads of the cancelled jobs are still running, new jobs must wait
+        return await asyncio.gather(*[manager.acreate(f'{i}.zip', ()) for i in range(4)])
+
+    results = asyncio.run(run())
+
+    assert [archive for archive, _, _ in results] == ['0.zip', '1.zip', '2.zip', '3.zip']
+    assert TrackedArchiveManager.peak == 2
+    assert TrackedArchiveManager.running == 0
+
+
+def test_listing_is_streamed_in_batches():
+    from core import async_manager
+
+    produced = []
+
+    class LargeArchiveManager:
+        def create_archive(self, archive, files, **options):
+            return 'created'
+
+        def list_archive(self, archive, **options):
+            for i in range(100 * async_manager.LIST_BATCH_SIZE):
+                produced.append(i)
+                yield f'file{i}'
+
+    manager = AsyncArchiveManager(max_jobs=1, manager_factory=LargeArchiveManager)
+
+    async def run():
+        entries = manager.alist('big.zip')
+        first = await entries.__anext__()
+        # Give the worker thread time to run ahead as far as the queue allows
+        await asyncio.sleep(0.2)
+        read_ahead = len(produced)
+        await entries.aclose()
+
+        # Closing the iterator stops the thread and frees the only slot
+        later = await asyncio.wait_for(manager.acreate('other.zip', ()), timeout=5)
+        return first, read_ahead, later
+
+    first, read_ahead, later = asyncio.run(run())
+
+    assert first == 'file0'
+    limit = (async_manager.LIST_QUEUE_BATCHES + 2) * async_manager.LIST_BATCH_SIZE
+    assert read_ahead <= limit
+    assert later == 'created'
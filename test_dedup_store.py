@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the deduplicating archive format
+"""
+
+import io
+import os
+import random
+
+import pytest
+
+from core import dedup_store
+from core.dedup_store import (
+    DedupStoreError, MAX_CHUNK, MIN_CHUNK, create_store, extract_store, list_store,
+    read_index, split_chunks, verify_store,
+)
+
+
+def test_chunks_resynchronise_after_an_insertion():
+    data = random.Random(1).randbytes(3 * 1024 * 1024)
+    chunks = list(split_chunks(io.BytesIO(data)))
+    shifted = list(split_chunks(io.BytesIO(b'inserted bytes' + data)))
+
+    assert b''.join(chunks) == data
+    assert all(MIN_CHUNK <= len(chunk) <= MAX_CHUNK for chunk in chunks[:-1])
+    assert len(set(chunks) & set(shifted)) >= len(chunks) - 2
+    # Runs of one byte value never match the cut pattern and get cut at the maximum
+    assert [len(chunk) for chunk in split_chunks(io.BytesIO(bytes(300000)))] == [MAX_CHUNK, MAX_CHUNK, 300000 - 2 * MAX_CHUNK]
+
+
+def test_duplicates_are_stored_once(tmp_path):
+    image = random.Random(2).randbytes(2 * 1024 * 1024)
+    (tmp_path / 'vm').mkdir()
+    (tmp_path / 'vm' / 'a.img').write_bytes(image)
+    (tmp_path / 'vm' / 'b.img').write_bytes(image[:1000000] + b'patched' + image[1000000:])
+    (tmp_path / 'vm' / 'c.img').write_bytes(image)
+    (tmp_path / 'vm' / 'empty').mkdir()
+    (tmp_path / 'vm' / 'blank.txt').write_bytes(b'')
+    archive = tmp_path / 'backup.hrnd'
+
+    assert create_store(archive, [tmp_path / 'vm'], workers=3) == 6
+
+    # Three copies of the image cost little more than one
+    assert archive.stat().st_size < len(image) * 1.15
+    assert list_store(archive) == ['vm/', 'vm/a.img', 'vm/b.img', 'vm/blank.txt', 'vm/c.img', 'vm/empty/']
+    assert verify_store(archive)
+
+    extract_store(archive, tmp_path / 'out')
+    for name in ('a.img', 'b.img', 'c.img', 'blank.txt'):
+        assert (tmp_path / 'out' / 'vm' / name).read_bytes() == (tmp_path / 'vm' / name).read_bytes()
+    assert (tmp_path / 'out' / 'vm' / 'empty').is_dir()
+    assert os.stat(tmp_path / 'out' / 'vm' / 'a.img').st_mtime_ns == os.stat(tmp_path / 'vm' / 'a.img').st_mtime_ns
+
+
+def test_repeated_chunks_are_compressed_once(tmp_path, monkeypatch):
+    block = random.Random(3).randbytes(1024 * 1024)
+    (tmp_path / 'twice.bin').write_bytes(block + block)
+    compressed = []
+    compress = dedup_store._compress_chunk
+    monkeypatch.setattr(dedup_store, '_compress_chunk',
+                        lambda data, level: compressed.append(len(data)) or compress(data, level))
+
+    create_store(tmp_path / 'out.hrnd', [tmp_path / 'twice.bin'])
+
+    assert sum(compressed) < len(block) * 1.1
+
+
+def test_damage_is_detected(tmp_path):
+    (tmp_path / 'text.txt').write_text('some text ' * 10000)
+    archive = tmp_path / 'out.hrnd'
+    create_store(archive, [tmp_path / 'text.txt'])
+    with open(archive, 'rb') as f:
+        offset = read_index(f)['chunks'][0][0]
+    raw = bytearray(archive.read_bytes())
+    raw[offset + 5] ^= 0xFF
+    archive.write_bytes(bytes(raw))
+
+    assert not verify_store(archive)
+    with pytest.raises(DedupStoreError):
+        extract_store(archive, tmp_path / 'out')
+    (tmp_path / 'other.hrnd').write_bytes(b'PK\x05\x06' + bytes(40))
+    with pytest.raises(DedupStoreError):
+        list_store(tmp_path / 'other.hrnd')
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Tests for the HRNZipper headless command line mode
+"""
+
+import os
+import sys
+import types
+import zipfile
+
+import main
+
+
+class FakeArchiveManager:
+    """Records the calls made by the headless dispatcher"""
+    calls = []
+
+    def create_archive(self, archive, files, **options):
+        self.calls.append(('create', archive, files, options))
+        return True
+
+    def extract_archive(self, archive, destination, **options):
+        self.calls.append(('extract', archive, destination, options))
+        return True
+
+    def list_archive(self, archive, **options):
+        self.calls.append(('list', archive, options))
+        return [{'name': 'a.txt'}, 'b.txt']
+
+    def test_archive(self, archive, **options):
+        self.calls.append(('test', archive, options))
+        return False
+
+
+def install_fake_manager(monkeypatch):
+    FakeArchiveManager.calls = []
+    core = types.ModuleType('core')
+    # Keep the real core modules that do not need ArchiveManager importable
+    core.__path__ = [os.path.join(os.path.dirname(os.path.abspath(main.__file__)), 'core')]
+    archive_manager = types.ModuleType('core.archive_manager')
+    archive_manager.ArchiveManager = FakeArchiveManager
+    core.archive_manager = archive_manager
+    monkeypatch.setitem(sys.modules, 'core', core)
+    monkeypatch.setitem(sys.modules, 'core.archive_manager', archive_manager)
+
+
+def test_headless_commands_skip_pyqt(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    monkeypatch.delitem(sys.modules, 'PyQt5', raising=False)
+    archive = tmp_path / 'out.7z'
+
+    monkeypatch.setattr(sys, 'argv', ['hrnzipper', 'create', str(archive), 'src', '-l', '9'])
+    assert main.main() == 0
+    assert FakeArchiveManager.calls == [
+        ('create', str(archive), [os.path.join(os.getcwd(), 'src')], {'compression_level': 9})
+    ]
+    assert 'PyQt5' not in sys.modules
+
+
+def test_headless_list_extract_and_test(monkeypatch, tmp_path, capsys):
+    install_fake_manager(monkeypatch)
+    archive = tmp_path / 'in.7z'
+    archive.write_bytes(b'')
+
+    assert main.run_headless(['list', str(archive)]) == 0
+    assert capsys.readouterr().out.splitlines() == ['a.txt', 'b.txt']
+
+    assert main.run_headless(['extract', str(archive)]) == 0
+    assert FakeArchiveManager.calls[-1][2] == str(tmp_path)
+
+    # A False result from the manager is reported as a failing exit code
+    assert main.run_headless(['test', str(archive), '-p', 'secret']) == 1
+    assert FakeArchiveManager.calls[-1] == ('test', str(archive), {'password': 'secret'})
+
+
+def test_headless_zip_list_skips_archive_manager(monkeypatch, tmp_path, capsys):
+    install_fake_manager(monkeypatch)
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('docs/', '')
+        zf.writestr('docs/readme.txt', 'hello')
+
+    assert main.run_headless(['list', str(archive)]) == 0
+    assert capsys.readouterr().out.splitlines() == ['docs/', 'docs/readme.txt']
+    assert FakeArchiveManager.calls == []
+
+    # Archives the lister cannot read are listed by ArchiveManager instead
+    archive.write_bytes(b'not a zip file')
+    assert main.run_headless(['list', str(archive)]) == 0
+    assert capsys.readouterr().out.splitlines() == ['a.txt', 'b.txt']
+    assert FakeArchiveManager.calls == [('list', str(archive), {})]
+
+
+def test_headless_zip_create_uses_parallel_writer(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'a.txt').write_text('hello ' * 100)
+    archive = tmp_path / 'out.zip'
+
+    assert main.run_headless(['create', str(archive), str(source), '-l', '9']) == 0
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.namelist() == ['src/', 'src/a.txt']
+        assert zf.read('src/a.txt') == b'hello ' * 100
+    assert FakeArchiveManager.calls == []
+
+    # Encrypted archives still go through ArchiveManager
+    assert main.run_headless(['create', str(archive), str(source), '-p', 'secret']) == 0
+    assert FakeArchiveManager.calls[-1][0] == 'create'
+
+
+def test_headless_zip_extract(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('docs/readme.txt', 'hello')
+
+    assert main.run_headless(['extract', str(archive), str(tmp_path / 'out')]) == 0
+    assert (tmp_path / 'out' / 'docs' / 'readme.txt').read_text() == 'hello'
+    assert FakeArchiveManager.calls == []
+
+    # Members the extractor cannot decompress are left to ArchiveManager
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('packed.txt', 'x' * 100, zipfile.ZIP_BZIP2)
+    assert main.run_headless(['extract', str(archive), str(tmp_path / 'out')]) == 0
+    assert FakeArchiveManager.calls == [('extract', str(archive), str(tmp_path / 'out'), {})]
+
+
+def test_headless_zip_extract_single_member(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('docs/readme.txt', 'hello')
+        zf.writestr('other.txt', 'skip')
+
+    assert main.run_headless(['extract', str(archive), str(tmp_path / 'out'), '-m', 'docs/readme.txt']) == 0
+    assert os.listdir(tmp_path / 'out') == ['docs']
+    assert (tmp_path / 'out' / 'docs' / 'readme.txt').read_text() == 'hello'
+
+    assert main.run_headless(['extract', str(archive), str(tmp_path / 'out'), '-m', 'absent.txt']) == 1
+    assert FakeArchiveManager.calls == []
+
+
+def test_headless_tar_gz_create_and_extract_member(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'readme.txt').write_text('hello')
+    (tmp_path / 'docs' / 'other.txt').write_text('skip')
+    archive = tmp_path / 'out.tar.gz'
+
+    assert main.run_headless(['create', str(archive), str(tmp_path / 'docs')]) == 0
+    assert main.run_headless(['extract', str(archive), str(tmp_path / 'out'), '-m', 'docs/readme.txt']) == 0
+
+    assert os.listdir(tmp_path / 'out' / 'docs') == ['readme.txt']
+    assert (tmp_path / 'out' / 'docs' / 'readme.txt').read_text() == 'hello'
+    assert FakeArchiveManager.calls == []
+
+
+def test_headless_zip_update_delete_and_merge(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('old.txt', 'old')
+    (tmp_path / 'new.txt').write_text('new')
+
+    assert main.run_headless(['update', str(archive), str(tmp_path / 'new.txt')]) == 0
+    assert main.run_headless(['delete', str(archive), 'old.txt']) == 0
+    assert main.run_headless(['merge', str(tmp_path / 'all.zip'), str(archive), str(archive)]) == 0
+
+    with zipfile.ZipFile(tmp_path / 'all.zip') as zf:
+        assert zf.namelist() == ['new.txt']
+    assert main.run_headless(['delete', str(archive), 'missing.txt']) == 1
+    assert main.run_headless(['delete', str(tmp_path / 'in.7z'), 'a.txt']) == 3
+    (tmp_path / 'in.7z').write_bytes(b'')
+    assert main.run_headless(['delete', str(tmp_path / 'in.7z'), 'a.txt']) == 1
+    assert FakeArchiveManager.calls == []
+
+
+def test_headless_incremental_zip(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'a.txt').write_text('a')
+    (tmp_path / 'docs' / 'b.txt').write_text('b')
+
+    assert main.run_headless(['create', str(tmp_path / 'full.zip'), str(tmp_path / 'docs'), '--manifest']) == 0
+    (tmp_path / 'docs' / 'b.txt').write_text('changed')
+    assert main.run_headless(['create', str(tmp_path / 'delta.zip'), str(tmp_path / 'docs'),
+                              '--base', str(tmp_path / 'full.zip')]) == 0
+    assert main.run_headless(['extract', str(tmp_path / 'delta.zip'), str(tmp_path / 'out')]) == 0
+
+    assert (tmp_path / 'out' / 'docs' / 'a.txt').read_text() == 'a'
+    assert (tmp_path / 'out' / 'docs' / 'b.txt').read_text() == 'changed'
+    assert main.run_headless(['create', str(tmp_path / 'x.7z'), str(tmp_path / 'docs'), '--manifest']) == 1
+    assert FakeArchiveManager.calls == []
+
+
+def test_headless_dedup_archive(monkeypatch, tmp_path, capsys):
+    install_fake_manager(monkeypatch)
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'a.txt').write_text('same')
+    (tmp_path / 'docs' / 'b.txt').write_text('same')
+    archive = tmp_path / 'out.hrnd'
+
+    assert main.run_headless(['create', str(archive), str(tmp_path / 'docs')]) == 0
+    assert main.run_headless(['list', str(archive)]) == 0
+    assert capsys.readouterr().out.split() == ['docs/', 'docs/a.txt', 'docs/b.txt']
+    assert main.run_headless(['test', str(archive)]) == 0
+    assert main.run_headless(['extract', str(archive), str(tmp_path / 'out')]) == 0
+    assert (tmp_path / 'out' / 'docs' / 'b.txt').read_text() == 'same'
+    assert main.run_headless(['extract', str(archive), '-p', 'secret']) == 1
+    assert FakeArchiveManager.calls == []
+
+
+def test_headless_missing_archive(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    assert main.run_headless(['extract', str(tmp_path / 'missing.zip')]) == main.EXIT_NOT_FOUND
+
+
+def test_forwarded_commands_share_one_manager(monkeypatch, tmp_path):
+    install_fake_manager(monkeypatch)
+    archive = tmp_path / 'in.zip'
+    archive.write_bytes(b'')
+
+    jobs = main.start_command_worker()
+    jobs.put((['extract', 'in.zip', 'out'], str(tmp_path)))
+    jobs.put((['extract', 'in.zip', '--bogus'], str(tmp_path)))
+    jobs.put((['test', 'in.zip'], str(tmp_path)))
+    jobs.join()
+
+    # Tests run ahead of extractions when both are waiting
+    assert sorted(FakeArchiveManager.calls) == [
+        ('extract', str(archive), str(tmp_path / 'out'), {}),
+        ('test', str(archive), {}),
+    ]
+
+
+def test_command_worker_keeps_draining_without_archive_manager(monkeypatch, caplog):
+    class BrokenArchiveManager:
+        def __init__(self):
+            raise RuntimeError('backend missing')
+
+    install_fake_manager(monkeypatch)
+    monkeypatch.setattr(sys.modules['core.archive_manager'], 'ArchiveManager', BrokenArchiveManager)
+
+    with caplog.at_level('ERROR', logger='main'):
+        jobs = main.start_command_worker()
+        jobs.put((['extract', 'in.zip'], os.getcwd()))
+        jobs.put((['test', 'in.zip'], os.getcwd()))
+        # join() returns only if the workers are still taking jobs
+        jobs.join()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert 'backend missing' in messages[0]
+    assert len([m for m in messages if m.startswith('Skipped forwarded command')]) == 2
+
+
+def test_startup_profile_is_logged_once(monkeypatch, caplog):
+    monkeypatch.setattr(sys, 'stderr', None)
+    profiler = main.StartupProfiler(enabled=True)
+    profiler.mark('logging')
+    profiler.mark('window')
+
+    with caplog.at_level('INFO', logger='main'):
+        profiler.report()
+        profiler.report()
+
+    assert len(caplog.records) == 1
+    lines = caplog.records[0].getMessage().splitlines()
+    assert [line.split()[0] for line in lines[1:]] == ['logging', 'window', 'total']
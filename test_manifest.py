@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental ZIP archiving
+"""
+
+import os
+import zipfile
+
+import pytest
+
+from core import manifest
+from core.manifest import (
+    ManifestError, archive_chain, create_incremental, diff_entries, load_manifest, restore,
+)
+
+
+def read_tree(root):
+    result = {}
+    for folder, dirs, names in os.walk(root):
+        for name in dirs:
+            result[os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/') + '/'] = None
+        for name in names:
+            path = os.path.join(folder, name)
+            result[os.path.relpath(path, root).replace(os.sep, '/')] = open(path, 'rb').read()
+    return result
+
+
+def make_project(root):
+    (root / 'project' / 'src').mkdir(parents=True)
+    (root / 'project' / 'src' / 'main.py').write_text('print(1)')
+    (root / 'project' / 'src' / 'util.py').write_text('x = 1')
+    (root / 'project' / 'README').write_text('readme')
+
+
+def test_diff_entries():
+    old = {'a': [1, 10, 'h1'], 'b': [2, 10, 'h2'], 'c': [3, 10, 'h3']}
+    new = {'a': [1, 20, 'h1'], 'b': [2, 10, 'h9'], 'd': [4, 10, 'h4']}
+
+    assert diff_entries(old, new) == (['b', 'd'], ['c'])
+
+
+def test_chain_archives_only_changes_and_restores(tmp_path, monkeypatch):
+    make_project(tmp_path)
+    project = tmp_path / 'project'
+    full = tmp_path / 'night1.zip'
+    assert create_incremental(full, [project]) == (5, 0)
+    state1 = read_tree(tmp_path / 'project')
+
+    (project / 'src' / 'main.py').write_text('print(2)')
+    (project / 'src' / 'util.py').unlink()
+    (project / 'new.txt').write_text('new')
+    # Touching a file without changing it archives nothing
+    os.utime(project / 'README', ns=(1, 1))
+    hashed = []
+    digest = manifest.file_digest
+    monkeypatch.setattr(manifest, 'file_digest', lambda path: hashed.append(os.path.basename(path)) or digest(path))
+    delta = tmp_path / 'night2.zip'
+    assert create_incremental(delta, [project], base=full) == (2, 1)
+
+    assert sorted(hashed) == ['README', 'main.py', 'new.txt']
+    with zipfile.ZipFile(delta) as zf:
+        assert sorted(zf.namelist()) == ['project/new.txt', 'project/src/main.py']
+    assert load_manifest(delta)['deleted'] == ['project/src/util.py']
+    assert load_manifest(delta)['base'] == 'night1.zip'
+
+    (project / 'new.txt').write_text('newer')
+    third = tmp_path / 'night3.zip'
+    create_incremental(third, [project], base=delta)
+    assert [os.path.basename(path) for path, _ in archive_chain(third)] == ['night3.zip', 'night2.zip', 'night1.zip']
+
+    assert restore(third, tmp_path / 'restored') == 5
+    assert read_tree(tmp_path / 'restored' / 'project') == read_tree(project)
+    assert restore(full, tmp_path / 'first') == 5
+    assert read_tree(tmp_path / 'first' / 'project') == state1
+
+
+def test_broken_chains(tmp_path):
+    make_project(tmp_path)
+    full = tmp_path / 'full.zip'
+    create_incremental(full, [tmp_path / 'project'])
+    (tmp_path / 'project' / 'README').write_text('changed')
+    delta = tmp_path / 'delta.zip'
+    create_incremental(delta, [tmp_path / 'project'], base=full)
+
+    with pytest.raises(ManifestError):
+        create_incremental(tmp_path / 'other.zip', [tmp_path / 'project'], base=tmp_path / 'missing.zip')
+    full.unlink()
+    with pytest.raises(ManifestError):
+        restore(delta, tmp_path / 'out')
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for per-file compression method selection
+"""
+
+import os
+
+from core.method_selector import SAMPLE_SIZE, has_compressed_signature, is_compressible_sample, should_compress
+
+
+def test_extension_decides_without_reading(tmp_path):
+    # The file does not exist, so it must not be read
+    assert not should_compress(str(tmp_path / 'movie.MKV'))
+
+
+def test_magic_bytes():
+    assert has_compressed_signature(b'\x1f\x8b\x08\x00')
+    assert has_compressed_signature(b'\x00\x00\x00\x18ftypmp42')
+    assert not has_compressed_signature(b'hello world')
+    assert not has_compressed_signature(b'')
+
+
+def test_sample_ratio(tmp_path):
+    text = tmp_path / 'notes'
+    text.write_text('some notes ' * 10000)
+    noise = tmp_path / 'noise'
+    noise.write_bytes(os.urandom(SAMPLE_SIZE * 2))
+
+    assert should_compress(str(text))
+    assert not should_compress(str(noise))
+    assert not is_compressible_sample(b'')
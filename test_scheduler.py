@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job scheduler
+"""
+
+import threading
+
+import pytest
+
+from core.scheduler import (
+    BATCH, CANCELLED, DONE, FAILED, INTERACTIVE, NORMAL, JobScheduler, disk_of,
+)
+
+
+def blocker():
+    """A job that holds its worker until released"""
+    started, release = threading.Event(), threading.Event()
+
+    def job(cancel):
+        started.set()
+        release.wait(5)
+    return job, started, release
+
+
+def test_urgent_jobs_jump_ahead():
+    scheduler = JobScheduler(workers=1)
+    job, started, release = blocker()
+    order = []
+    scheduler.submit(job)
+    assert started.wait(5)
+
+    for name, priority in (('batch', BATCH), ('normal', NORMAL), ('preview', INTERACTIVE), ('batch 2', BATCH)):
+        scheduler.submit(lambda cancel, name=name: order.append(name), priority=priority)
+    release.set()
+    scheduler.join()
+    scheduler.shutdown()
+
+    assert order == ['preview', 'normal', 'batch', 'batch 2']
+
+
+def test_cancellation():
+    scheduler = JobScheduler(workers=1)
+    job, started, release = blocker()
+    ran = []
+
+    def polling(cancel):
+        while True:
+            cancel.check()
+            started.wait(0.01)
+
+    first = scheduler.submit(job)
+    assert started.wait(5)
+    queued = scheduler.submit(lambda cancel: ran.append(True))
+    scheduler.cancel(queued)
+    release.set()
+    assert queued.wait(5) and queued.state == CANCELLED
+    assert not ran
+    assert first.state == DONE
+
+    running = scheduler.submit(polling)
+    scheduler.cancel_all()
+    scheduler.join()
+    assert running.state == CANCELLED
+
+
+def test_failed_job_keeps_its_error():
+    scheduler = JobScheduler(workers=1)
+
+    def broken(cancel):
+        raise OSError('disk full')
+
+    job = scheduler.submit(broken)
+    scheduler.join()
+    assert job.state == FAILED
+    assert str(job.error) == 'disk full'
+    assert scheduler.submit(lambda cancel: 42).wait(5)
+
+
+def test_one_job_per_disk(tmp_path):
+    scheduler = JobScheduler(workers=3, per_disk=1)
+    job, started, release = blocker()
+    order = []
+
+    scheduler.submit(job, paths=[tmp_path / 'a.zip'])
+    assert started.wait(5)
+    same_disk = scheduler.submit(lambda cancel: order.append('same disk'), paths=[tmp_path / 'b.zip'])
+    anywhere = scheduler.submit(lambda cancel: order.append('no disk'), priority=BATCH)
+    assert anywhere.wait(5)
+    assert not same_disk.done
+    release.set()
+    scheduler.join()
+
+    assert order == ['no disk', 'same disk']
+    assert disk_of(tmp_path / 'missing' / 'new.zip') == disk_of(tmp_path)
+
+
+def test_no_jobs_after_shutdown():
+    scheduler = JobScheduler(workers=2)
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda cancel: None)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for forwarding command lines to a running HRNZipper instance
+"""
+
+import os
+import queue
+import socket
+
+from utils.single_instance import InstanceServer, forward_to_instance
+
+
+def test_forward_to_running_instance(tmp_path):
+    directory = str(tmp_path / 'instance')
+    received = queue.Queue()
+
+    # Nothing is listening yet
+    assert forward_to_instance(['archive.zip'], directory) is False
+
+    server = InstanceServer(received.put, directory)
+    assert server.start() is True
+    try:
+        assert forward_to_instance(['archive.zip'], directory) is True
+        payload = received.get(timeout=5)
+        assert payload == {'argv': ['archive.zip'], 'cwd': os.getcwd()}
+
+        # The endpoint is owned by the running server
+        assert InstanceServer(received.put, directory).start() is False
+    finally:
+        server.stop()
+
+    assert forward_to_instance(['archive.zip'], directory) is False
+    assert received.empty()
+
+
+def test_private_directory_and_key(tmp_path):
+    directory = tmp_path / 'instance'
+    server = InstanceServer(directory=str(directory))
+    assert server.start() is True
+    server.stop()
+
+    assert directory.stat().st_mode & 0o777 == 0o700
+    assert (directory / 'instance.key').stat().st_mode & 0o777 == 0o600
+
+
+def test_commands_are_buffered_until_handler_is_set(tmp_path):
+    directory = str(tmp_path / 'instance')
+    received = queue.Queue()
+
+    server = InstanceServer(directory=directory)
+    assert server.start() is True
+    try:
+        assert forward_to_instance(['first.zip'], directory) is True
+        assert forward_to_instance(['second.zip'], directory) is True
+        server.set_handler(received.put)
+        assert forward_to_instance(['third.zip'], directory) is True
+
+        argvs = [received.get(timeout=5)['argv'] for _ in range(3)]
+        assert argvs == [['first.zip'], ['second.zip'], ['third.zip']]
+    finally:
+        server.stop()
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    directory = tmp_path / 'instance'
+    directory.mkdir(mode=0o700)
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(str(directory / 'instance.sock'))
+    stale.close()
+    received = queue.Queue()
+
+    server = InstanceServer(received.put, str(directory))
+    assert server.start() is True
+    try:
+        assert forward_to_instance(['x'], str(directory)) is True
+        assert received.get(timeout=5)['argv'] == ['x']
+    finally:
+        server.stop()
+
+
+def test_shared_directory_is_refused(tmp_path):
+    directory = tmp_path / 'instance'
+    directory.mkdir()
+    directory.chmod(0o777)
+
+    assert InstanceServer(directory=str(directory)).start() is False
+    assert forward_to_instance(['x'], str(directory)) is False
+    assert not (directory / 'instance.key').exists()
+
+
+def test_only_one_of_many_concurrent_launches_owns_the_endpoint(tmp_path):
+    import threading
+
+    directory = str(tmp_path / 'instance')
+    servers = [InstanceServer(directory=directory) for _ in range(10)]
+    results = [None] * len(servers)
+    barrier = threading.Barrier(len(servers))
+
+    def launch(index):
+        barrier.wait()
+        results[index] = servers[index].start()
+
+    threads = [threading.Thread(target=launch, args=(i,)) for i in range(len(servers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert results.count(True) == 1
+        assert forward_to_instance(['x'], directory) is True
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def test_unusable_lock_file_disables_the_server(tmp_path):
+    directory = tmp_path / 'instance'
+    directory.mkdir(mode=0o700)
+    # A directory where the lock file should be cannot be opened for appending
+    (directory / 'instance.lock').mkdir()
+
+    assert InstanceServer(directory=str(directory)).start() is False
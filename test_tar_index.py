@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the compressed TAR checkpoint index
+"""
+
+import io
+import os
+import random
+import tarfile
+
+import pytest
+
+from core import tar_index
+from core.tar_index import (
+    TarIndexError, build_index, extract_members, get_index, load_index, open_member, write_tar,
+)
+
+
+def make_tree(root):
+    rng = random.Random(9)
+    (root / 'data' / 'empty').mkdir(parents=True)
+    for i in range(12):
+        size = rng.randrange(1, 60000)
+        (root / 'data' / f'file{i:02}.bin').write_bytes(rng.randbytes(size // 2) + b'x' * (size // 2))
+    (root / 'data' / 'notlar ğüş.txt').write_text('not')
+
+
+@pytest.mark.parametrize('suffix', ['.tar.gz', '.tar.bz2'])
+def test_written_archive_reads_back_from_checkpoints(tmp_path, suffix):
+    make_tree(tmp_path)
+    archive = tmp_path / f'out{suffix}'
+
+    count = write_tar(archive, [tmp_path / 'data'], span=64 * 1024)
+
+    with tarfile.open(archive) as tar:
+        names = tar.getnames()
+        expected = {info.name: tar.extractfile(info).read() for info in tar if info.isfile()}
+    assert count == len(names) == 15
+    index = load_index(archive)
+    assert len(index['checkpoints']) > 4
+    for name, data in expected.items():
+        with open_member(archive, name, index) as member:
+            assert member.read() == data
+
+
+@pytest.mark.parametrize('mode', ['w:gz', 'w:bz2'])
+def test_index_built_from_other_archives(tmp_path, mode):
+    archive = tmp_path / ('in.tar.gz' if mode == 'w:gz' else 'in.tar.bz2')
+    with tarfile.open(archive, mode) as tar:
+        for name, data in (('a.txt', b'first'), ('dir/b.txt', b'second' * 1000)):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    index = build_index(archive)
+
+    assert index['checkpoints'] == [[0, 0]]
+    assert [row[0] for row in index['members']] == ['a.txt', 'dir/b.txt']
+    with open_member(archive, 'dir/b.txt') as member:
+        assert member.read() == b'second' * 1000
+
+
+def test_concatenated_members_become_checkpoints(tmp_path):
+    # Multi-member gzip files from other tools are indexed at their boundaries
+    make_tree(tmp_path)
+    write_tar(tmp_path / 'out.tar.gz', [tmp_path / 'data'], span=32 * 1024)
+    written = load_index(tmp_path / 'out.tar.gz')
+    os.unlink(tar_index.index_path(tmp_path / 'out.tar.gz'))
+
+    rebuilt = build_index(tmp_path / 'out.tar.gz', span=32 * 1024)
+
+    assert rebuilt['checkpoints'] == written['checkpoints']
+    assert rebuilt['members'] == written['members']
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    make_tree(tmp_path)
+    archive = tmp_path / 'out.tar.gz'
+    write_tar(archive, [tmp_path / 'data' / 'file00.bin'])
+    assert load_index(archive) is not None
+
+    write_tar(archive, [tmp_path / 'data' / 'file01.bin'])
+    os.utime(archive, ns=(1, 1))
+
+    assert load_index(archive) is None
+    assert [row[0] for row in get_index(archive)['members']] == ['file01.bin']
+    assert load_index(archive) is not None
+
+
+def test_extract_members(tmp_path):
+    make_tree(tmp_path)
+    archive = tmp_path / 'out.tar.bz2'
+    write_tar(archive, [tmp_path / 'data'])
+
+    assert extract_members(archive, ['data/file03.bin', 'data/empty'], tmp_path / 'out') == 2
+
+    assert (tmp_path / 'out' / 'data' / 'file03.bin').read_bytes() == (tmp_path / 'data' / 'file03.bin').read_bytes()
+    assert (tmp_path / 'out' / 'data' / 'empty').is_dir()
+    assert sorted(os.listdir(tmp_path / 'out' / 'data')) == ['empty', 'file03.bin']
+    with pytest.raises(KeyError):
+        open_member(archive, 'data/missing.bin')
+
+
+def test_corrupt_and_unknown_archives(tmp_path):
+    archive = tmp_path / 'bad.tar.gz'
+    archive.write_bytes(b'not gzip data at all')
+    with pytest.raises(TarIndexError):
+        build_index(archive)
+    with pytest.raises(TarIndexError):
+        build_index(tmp_path / 'plain.tar')
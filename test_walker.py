@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the parallel folder walker
+"""
+
+import os
+import sys
+
+import pytest
+
+from core.walker import Walker
+
+
+def make_tree(root, depth=3, width=3):
+    for number in range(width):
+        (root / f'file{number}.txt').write_text('x' * number)
+    if depth:
+        for number in range(width):
+            folder = root / f'sub{number}'
+            folder.mkdir()
+            make_tree(folder, depth - 1, width)
+
+
+def sorted_walk(top):
+    """Paths in the order of a sorted top-down os.walk"""
+    paths = []
+    for root, dirs, names in os.walk(top):
+        dirs.sort()
+        paths.append(root)
+        paths.extend(os.path.join(root, name) for name in sorted(names))
+    return paths
+
+
+@pytest.mark.parametrize('window', [1, 2, 64])
+def test_order_matches_os_walk(tmp_path, window):
+    top = tmp_path / 'tree'
+    top.mkdir()
+    make_tree(top)
+    walker = Walker(workers=3, window=window)
+
+    entries = list(walker.walk(top))
+
+    assert [entry.path for entry in entries] == sorted_walk(top)
+    assert entries[0].name == 'tree'
+    assert entries[1].name == 'tree/file0.txt'
+    assert all(entry.stat == os.stat(entry.path) for entry in entries)
+    assert (walker.files, walker.folders) == (120, 40)
+    assert walker.bytes == 120
+
+
+def test_single_file(tmp_path):
+    (tmp_path / 'a.txt').write_text('hello')
+    walker = Walker()
+
+    entries = list(walker.walk(tmp_path / 'a.txt'))
+
+    assert [entry.name for entry in entries] == ['a.txt']
+    assert (walker.files, walker.folders, walker.bytes) == (1, 0, 5)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs symlinks')
+def test_links(tmp_path, caplog):
+    top = tmp_path / 'tree'
+    (top / 'real').mkdir(parents=True)
+    (top / 'real' / 'a.txt').write_text('a')
+    (top / 'linked').symlink_to(top / 'real')
+    (top / 'link.txt').symlink_to(top / 'real' / 'a.txt')
+    (top / 'broken.txt').symlink_to(top / 'missing.txt')
+
+    names = [entry.name for entry in Walker().walk(top)]
+
+    # Like os.walk, links to folders are not followed
+    assert names == ['tree', 'tree/link.txt', 'tree/real', 'tree/real/a.txt']
+    assert 'broken.txt' in caplog.text
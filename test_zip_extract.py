@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the parallel ZIP extractor
+"""
+
+import os
+import zipfile
+
+import pytest
+
+from core import zip_extract
+from core.zip_extract import ByteBudget, copy_range, extract_zip
+from core.zip_listing import UnsupportedMemberError, ZipDataError
+
+
+def make_archive(path, count=40):
+    contents = {}
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('folder/', '')
+        zf.writestr('folder/empty/', '')
+        for i in range(count):
+            name = f'folder/sub{i % 3}/file{i}.txt'
+            data = (f'line {i} ' * (i * 50)).encode() + os.urandom(i)
+            method = zipfile.ZIP_STORED if i % 4 == 0 else zipfile.ZIP_DEFLATED
+            zf.writestr(name, data, method)
+            contents[name] = data
+        zf.writestr('folder/ğüş.txt', 'içerik')
+        contents['folder/ğüş.txt'] = 'içerik'.encode()
+    return contents
+
+
+def read_tree(root):
+    result = {}
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            result[os.path.relpath(path, root).replace(os.sep, '/')] = open(path, 'rb').read()
+    return result
+
+
+def test_extraction_matches_zipfile(tmp_path):
+    archive = tmp_path / 'in.zip'
+    contents = make_archive(archive)
+
+    count = extract_zip(archive, tmp_path / 'out', workers=4)
+
+    assert count == len(contents) + 2
+    assert read_tree(tmp_path / 'out') == contents
+    assert (tmp_path / 'out' / 'folder' / 'empty').is_dir()
+
+
+def test_tiny_budget_still_extracts_everything(tmp_path):
+    archive = tmp_path / 'in.zip'
+    contents = make_archive(archive)
+
+    extract_zip(archive, tmp_path / 'out', workers=4, max_inflight_bytes=1)
+
+    assert read_tree(tmp_path / 'out') == contents
+
+
+def test_byte_budget_admits_oversized_requests_alone():
+    budget = ByteBudget(100)
+    budget.acquire(500)
+    assert budget.used == 500
+    budget.release(500)
+    budget.acquire(60)
+    budget.acquire(40)
+    assert budget.used == 100
+
+
+def test_names_cannot_leave_the_destination(tmp_path):
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('../escaped.txt', 'a')
+        zf.writestr('/absolute.txt', 'b')
+        zf.writestr('nested/../../up.txt', 'c')
+
+    extract_zip(archive, tmp_path / 'out')
+
+    assert read_tree(tmp_path / 'out') == {'escaped.txt': b'a', 'absolute.txt': b'b', 'nested/up.txt': b'c'}
+    assert not (tmp_path / 'escaped.txt').exists()
+
+
+def test_unsupported_members_are_refused_before_writing(tmp_path):
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('plain.txt', 'a')
+        zf.writestr('packed.txt', 'b' * 100, zipfile.ZIP_BZIP2)
+
+    with pytest.raises(UnsupportedMemberError):
+        extract_zip(archive, tmp_path / 'out')
+    assert not (tmp_path / 'out').exists()
+
+
+def test_corrupt_member_raises(tmp_path):
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('data.bin', b'original data', zipfile.ZIP_STORED)
+    archive.write_bytes(archive.read_bytes().replace(b'original', b'modified'))
+
+    with pytest.raises(ZipDataError):
+        extract_zip(archive, tmp_path / 'out')
+
+
+def test_stored_members_without_kernel_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_extract, 'KERNEL_COPIES', [])
+    archive = tmp_path / 'in.zip'
+    contents = make_archive(archive)
+
+    extract_zip(archive, tmp_path / 'out')
+
+    assert read_tree(tmp_path / 'out') == contents
+
+
+def test_copy_range(tmp_path):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(bytes(range(256)) * 100)
+
+    with open(source, 'rb') as f, open(tmp_path / 'target.bin', 'wb') as out:
+        out.write(b'head')
+        out.flush()
+        copied = copy_range(f.fileno(), out.fileno(), 1000, 5000)
+        if not copied:
+            out.write(source.read_bytes()[1000:6000])
+        out.write(b'tail')
+
+    assert (tmp_path / 'target.bin').read_bytes() == b'head' + source.read_bytes()[1000:6000] + b'tail'
+    with open(source, 'rb') as f, open(tmp_path / 'target.bin', 'wb') as out:
+        with pytest.raises(ZipDataError):
+            copy_range(f.fileno(), out.fileno(), 25000, 1000) or pytest.skip('No kernel copy here')
+
+
+def test_corrupt_deflate_member_raises(tmp_path):
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('data.txt', b'compressible ' * 1000, zipfile.ZIP_DEFLATED)
+    raw = bytearray(archive.read_bytes())
+    raw[40:60] = b'\xff' * 20
+    archive.write_bytes(bytes(raw))
+
+    with pytest.raises(ZipDataError):
+        extract_zip(archive, tmp_path / 'out')
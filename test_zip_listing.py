@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tests for the central directory ZIP lister
+"""
+
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+import benchmark
+from core.zip_listing import NameTable, ZipListingError, list_zip
+
+
+def assert_matches_zipfile(path):
+    listing = list_zip(path)
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+
+    assert len(listing) == len(infos)
+    for entry, info in zip(listing, infos):
+        assert entry.name == info.filename
+        assert entry.size == info.file_size
+        assert entry.compressed_size == info.compress_size
+        assert entry.crc == info.CRC
+        assert entry.method == info.compress_type
+        assert entry.flags == info.flag_bits
+        assert entry.date_time == info.date_time
+        assert entry.header_offset == info.header_offset
+        assert entry.is_dir == info.is_dir()
+    return listing
+
+
+def test_listing_matches_zipfile(tmp_path):
+    path = tmp_path / 'mixed.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.comment = b'archive comment'
+        zf.writestr('folder/', '')
+        zf.writestr('folder/plain.txt', 'plain ' * 100, zipfile.ZIP_DEFLATED)
+        zf.writestr(zipfile.ZipInfo('stored.bin', (2020, 5, 17, 13, 45, 58)), b'\x00' * 10)
+        # Non-ASCII names get the UTF-8 flag, the others stay cp437
+        zf.writestr('klasör/dosya ğüş.txt', 'içerik')
+
+    listing = assert_matches_zipfile(path)
+    assert listing.names[0] == 'folder/'
+    assert listing[0].is_dir
+
+
+def test_signature_inside_comment(tmp_path):
+    path = tmp_path / 'comment.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.comment = b'PK\x05\x06' + b'\x00' * 30
+        zf.writestr('a.txt', 'a')
+
+    assert list_zip(path).names == ['a.txt']
+
+
+def test_listing_with_utf8_names_only(tmp_path):
+    path = tmp_path / 'utf8.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(20):
+            zf.writestr(f'belge-{i}-ş.txt', str(i))
+
+    assert_matches_zipfile(path)
+
+
+def test_empty_archive(tmp_path):
+    path = tmp_path / 'empty.zip'
+    zipfile.ZipFile(path, 'w').close()
+
+    assert len(list_zip(path)) == 0
+
+
+def test_zip64_entry_count(tmp_path):
+    # More than 65535 entries need the ZIP64 end of central directory record
+    path = tmp_path / 'many.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(70000):
+            zf.writestr(f'{i}', b'')
+
+    listing = list_zip(path)
+    assert len(listing) == 70000
+    assert listing.names[-1] == '69999'
+    with zipfile.ZipFile(path) as zf:
+        assert list(listing.header_offsets) == [info.header_offset for info in zf.infolist()]
+
+
+def write_zip64_archive(path, prefix=b'', extra=None):
+    """Write a stored single-entry archive whose sizes and offset are all in ZIP64 fields"""
+    name = b'large.bin'
+    data = b'zip64 payload'
+    crc = zlib.crc32(data)
+    placeholder = 0xFFFFFFFF
+
+    local = struct.pack('<4s5H3L2H', b'PK\x03\x04', 45, 0, 0, 0, 0x21,
+                        crc, len(data), len(data), len(name), 0) + name + data
+    if extra is None:
+        extra = struct.pack('<2H3Q', 0x0001, 24, len(data), len(data), 0)
+    central = struct.pack('<4s6H3L5H2L', b'PK\x01\x02', 45, 45, 0, 0, 0, 0x21,
+                          crc, placeholder, placeholder, len(name), len(extra), 0,
+                          0, 0, 0, placeholder) + name + extra
+    cd_offset = len(local)
+    zip64_offset = cd_offset + len(central)
+    zip64_eocd = struct.pack('<4sQ2H2L4Q', b'PK\x06\x06', 44, 45, 45, 0, 0,
+                             1, 1, len(central), cd_offset)
+    locator = struct.pack('<4sLQL', b'PK\x06\x07', 0, zip64_offset, 1)
+    eocd = struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, 0xFFFF, 0xFFFF,
+                       placeholder, placeholder, 0)
+    path.write_bytes(prefix + local + central + zip64_eocd + locator + eocd)
+
+
+def test_zip64_extra_field(tmp_path):
+    path = tmp_path / 'zip64.zip'
+    write_zip64_archive(path)
+
+    (entry,) = assert_matches_zipfile(path)
+    assert (entry.name, entry.size, entry.header_offset) == ('large.bin', 13, 0)
+
+
+def test_truncated_zip64_extra_field_raises(tmp_path):
+    path = tmp_path / 'zip64.zip'
+    # The field claims three values but only holds one
+    write_zip64_archive(path, extra=struct.pack('<2HQ', 0x0001, 24, 13))
+
+    with pytest.raises(ZipListingError):
+        list_zip(path)
+
+
+def test_trailing_data_after_archive(tmp_path):
+    path = tmp_path / 'padded.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.comment = b'comment'
+        zf.writestr('a.txt', 'a')
+    path.write_bytes(path.read_bytes() + b'\x00' * 10)
+
+    assert assert_matches_zipfile(path).names == ['a.txt']
+
+
+def test_prepended_data_shifts_offsets(tmp_path):
+    path = tmp_path / 'sfx.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('a.txt', 'a')
+        zf.writestr('b.txt', 'b')
+    path.write_bytes(b'MZ stub' * 100 + path.read_bytes())
+
+    listing = assert_matches_zipfile(path)
+    assert listing[0].header_offset == 700
+
+    zip64_path = tmp_path / 'sfx64.zip'
+    write_zip64_archive(zip64_path, prefix=b'MZ stub' * 100)
+    assert list_zip(zip64_path)[0].header_offset == 700
+
+
+def test_invalid_archives_raise(tmp_path):
+    path = tmp_path / 'bad.zip'
+
+    path.write_bytes(b'')
+    with pytest.raises(ZipListingError):
+        list_zip(path)
+
+    path.write_bytes(b'this is not a zip file' * 10)
+    with pytest.raises(ZipListingError):
+        list_zip(path)
+
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('a.txt', 'a')
+    data = bytearray(path.read_bytes())
+    data[data.find(b'PK\x01\x02')] = ord('X')
+    path.write_bytes(bytes(data))
+    with pytest.raises(ZipListingError):
+        list_zip(path)
+
+
+def test_listing_keeps_far_less_memory_than_zipinfo(tmp_path):
+    result = benchmark.measure_listing_memory(20000, tmp_path)
+
+    assert result['zip_listing_bytes'] * 5 < result['zipinfo_bytes']
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_name_table_lookups():
+    names = NameTable(['a/', 'a/b.txt', 'b.txt', 'ğüş.txt', ''])
+
+    assert len(names) == 5
+    assert names[1] == 'a/b.txt' and names[-2] == 'ğüş.txt' and names[1:3] == ['a/b.txt', 'b.txt']
+    assert names.index('b.txt') == 2
+    assert names.index('ğüş.txt') == 3
+    assert names.index('') == 4
+    assert names == ['a/', 'a/b.txt', 'b.txt', 'ğüş.txt', '']
+    with pytest.raises(ValueError):
+        names.index('a')
+    with pytest.raises(IndexError):
+        names[5]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for random access ZIP member reads
+"""
+
+import io
+import os
+import random
+import zipfile
+
+import pytest
+
+from core import zip_reader
+from core.zip_listing import UnsupportedMemberError, ZipDataError, list_zip
+from core.zip_reader import extract_members, open_member
+
+
+def make_archive(path):
+    rng = random.Random(7)
+    data = b''.join(rng.choice([b'alpha ', b'beta ', rng.randbytes(5)]) for _ in range(60000))
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('big.txt', data, zipfile.ZIP_DEFLATED)
+        zf.writestr('stored.bin', data[:5000], zipfile.ZIP_STORED)
+        zf.writestr('folder/', '')
+        zf.writestr('folder/small.txt', 'small', zipfile.ZIP_DEFLATED)
+    return data
+
+
+@pytest.mark.parametrize('name', ['big.txt', 'stored.bin'])
+def test_random_access_matches_member(tmp_path, monkeypatch, name):
+    # Small chunks make seeks cross many compressed reads
+    monkeypatch.setattr(zip_reader, 'CHUNK_SIZE', 4096)
+    archive = tmp_path / 'in.zip'
+    make_archive(archive)
+    with zipfile.ZipFile(archive) as zf:
+        expected = zf.read(name)
+
+    with open_member(archive, name) as member:
+        assert member.read() == expected
+        for offset in (len(expected) // 2, 10, len(expected) - 3, 0):
+            member.seek(offset)
+            assert member.read(100) == expected[offset:offset + 100]
+        assert member.seek(-50, io.SEEK_END) == len(expected) - 50
+        assert member.read() == expected[-50:]
+        member.seek(len(expected) + 10)
+        assert member.read() == b''
+
+
+def test_reading_does_not_touch_other_members(tmp_path):
+    archive = tmp_path / 'in.zip'
+    make_archive(archive)
+    listing = list_zip(archive)
+    # Damage the big member, the small one must still read fine
+    raw = bytearray(archive.read_bytes())
+    start = listing[0].header_offset + 100
+    raw[start:start + 200] = bytes(200)
+    archive.write_bytes(bytes(raw))
+
+    with open_member(archive, 'folder/small.txt', listing) as member:
+        assert member.read() == b'small'
+    with pytest.raises(ZipDataError):
+        with open_member(archive, 'big.txt') as member:
+            member.read()
+
+
+def test_crc_is_checked_on_full_reads(tmp_path):
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('data.bin', b'original data', zipfile.ZIP_STORED)
+    archive.write_bytes(archive.read_bytes().replace(b'original', b'modified'))
+
+    with open_member(archive, 'data.bin') as member:
+        with pytest.raises(ZipDataError):
+            member.read()
+    # Reads that skip part of the member cannot be checked
+    with open_member(archive, 'data.bin') as member:
+        member.seek(4)
+        assert member.read() == b'fied data'
+
+
+def test_missing_and_unsupported_members(tmp_path):
+    archive = tmp_path / 'in.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('packed.txt', 'b' * 100, zipfile.ZIP_BZIP2)
+
+    with pytest.raises(KeyError):
+        open_member(archive, 'absent.txt')
+    with pytest.raises(UnsupportedMemberError):
+        open_member(archive, 'packed.txt')
+
+
+def test_extract_members_writes_only_those(tmp_path):
+    archive = tmp_path / 'in.zip'
+    data = make_archive(archive)
+
+    assert extract_members(archive, ['big.txt', 'folder/small.txt'], tmp_path / 'out') == 2
+
+    assert (tmp_path / 'out' / 'big.txt').read_bytes() == data
+    assert (tmp_path / 'out' / 'folder' / 'small.txt').read_text() == 'small'
+    assert not (tmp_path / 'out' / 'stored.bin').exists()
+    assert sorted(os.listdir(tmp_path / 'out')) == ['big.txt', 'folder']
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for raw-copy ZIP update, delete and merge
+"""
+
+import os
+import zipfile
+
+import pytest
+
+from core import zip_extract
+from core.zip_listing import list_zip
+from core.zip_update import delete_members, merge, update
+
+
+def make_archive(path):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.comment = b'kept comment'
+        zf.writestr('docs/', '')
+        zf.writestr('docs/a.txt', 'alpha ' * 1000, zipfile.ZIP_DEFLATED)
+        zf.writestr('docs/b.bin', os.urandom(5000), zipfile.ZIP_STORED)
+        zf.writestr('ğüş.txt', 'not', zipfile.ZIP_DEFLATED)
+    # A member streamed with a data descriptor
+    with zipfile.ZipFile(path, 'a') as zf, zf.open('streamed.txt', 'w') as member:
+        member.write(b'streamed data ' * 100)
+
+
+def read_all(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def raw_members(path):
+    """Return the compressed bytes of every member"""
+    listing = list_zip(path)
+    with open(path, 'rb') as f:
+        result = {}
+        for entry in listing:
+            f.seek(zip_extract.member_data_offset(f, entry))
+            result[entry.name] = f.read(entry.compressed_size)
+        return result
+
+
+def test_delete_copies_the_other_members_verbatim(tmp_path):
+    archive = tmp_path / 'in.zip'
+    make_archive(archive)
+    before = read_all(archive)
+    raw_before = raw_members(archive)
+
+    assert delete_members(archive, ['docs/b.bin']) == 1
+
+    del before['docs/b.bin']
+    assert read_all(archive) == before
+    assert raw_members(archive) == {name: raw_before[name] for name in before}
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.comment == b'kept comment'
+    with pytest.raises(KeyError):
+        delete_members(archive, ['missing.txt'])
+    assert read_all(archive) == before
+
+
+def test_update_appends_in_place(tmp_path):
+    archive = tmp_path / 'in.zip'
+    make_archive(archive)
+    before = read_all(archive)
+    first_bytes = archive.read_bytes()[:list_zip(archive)[-1].header_offset]
+    (tmp_path / 'new.txt').write_text('new file')
+    inode = os.stat(archive).st_ino
+
+    assert update(archive, [tmp_path / 'new.txt']) == 1
+
+    assert read_all(archive) == {**before, 'new.txt': b'new file'}
+    assert archive.read_bytes().startswith(first_bytes)
+    assert os.stat(archive).st_ino == inode
+
+
+def test_update_replaces_members(tmp_path):
+    archive = tmp_path / 'in.zip'
+    make_archive(archive)
+    before = read_all(archive)
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'a.txt').write_text('replaced')
+
+    assert update(archive, [tmp_path / 'docs' / 'a.txt']) == 1
+
+    contents = read_all(archive)
+    assert contents == {**before, 'a.txt': b'replaced'}
+
+    update(archive, [tmp_path / 'docs'])
+    contents = read_all(archive)
+    assert contents['docs/a.txt'] == b'replaced'
+    assert list(contents).count('docs/a.txt') == 1
+    assert contents['docs/b.bin'] == before['docs/b.bin']
+
+
+def test_failed_update_restores_the_archive(tmp_path, monkeypatch):
+    archive = tmp_path / 'in.zip'
+    make_archive(archive)
+    original = archive.read_bytes()
+    (tmp_path / 'new.txt').write_text('new file')
+
+    def fail(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr('core.zip_update.write_central_directory', fail)
+
+    with pytest.raises(OSError):
+        update(archive, [tmp_path / 'new.txt'])
+    assert archive.read_bytes() == original
+
+
+def test_merge(tmp_path):
+    first = tmp_path / 'first.zip'
+    make_archive(first)
+    second = tmp_path / 'second.zip'
+    with zipfile.ZipFile(second, 'w') as zf:
+        zf.writestr('docs/a.txt', 'from second')
+        zf.writestr('extra.txt', 'extra')
+
+    assert merge(tmp_path / 'all.zip', [first, second]) == 6
+
+    contents = read_all(tmp_path / 'all.zip')
+    assert contents == {**read_all(first), 'docs/a.txt': b'from second', 'extra.txt': b'extra'}
+
+    # Merging into one of the sources
+    merge(first, [first, second])
+    assert read_all(first) == contents
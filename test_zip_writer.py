@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the parallel ZIP writer
+"""
+
+import os
+import random
+import zipfile
+import zlib
+
+import pytest
+
+from core import zip_writer
+from core.scheduler import CancelToken, JobCancelled
+from core.zip_listing import list_zip
+from core.zip_writer import crc32_combine, write_zip
+
+
+def make_tree(root):
+    (root / 'docs' / 'empty').mkdir(parents=True)
+    (root / 'docs' / 'readme.txt').write_text('read me ' * 500)
+    (root / 'docs' / 'notlar ğüş.txt').write_text('not')
+    (root / 'docs' / 'blank.txt').write_bytes(b'')
+    (root / 'single.bin').write_bytes(os.urandom(3000))
+
+
+def read_all(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def test_crc32_combine():
+    first, second = os.urandom(1000), os.urandom(70000)
+    assert crc32_combine(zlib.crc32(first), zlib.crc32(second), len(second)) == zlib.crc32(first + second)
+    assert crc32_combine(1234, 0, 0) == 1234
+
+
+def test_archive_matches_zipfile(tmp_path):
+    make_tree(tmp_path)
+    archive = tmp_path / 'out.zip'
+
+    count = write_zip(archive, [tmp_path / 'docs', tmp_path / 'single.bin'], workers=3)
+
+    contents = read_all(archive)
+    assert count == len(contents) == 6
+    assert list(contents) == [
+        'docs/', 'docs/blank.txt', 'docs/notlar ğüş.txt', 'docs/readme.txt',
+        'docs/empty/', 'single.bin',
+    ]
+    assert contents['docs/readme.txt'] == b'read me ' * 500
+    assert contents['single.bin'] == (tmp_path / 'single.bin').read_bytes()
+
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.getinfo('docs/').is_dir()
+        assert zf.getinfo('docs/readme.txt').compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo('docs/readme.txt').compress_size < 100
+    assert list_zip(archive).names == list(contents)
+
+
+def test_large_members_are_split_into_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_writer, 'CHUNK_SIZE', 64 * 1024)
+    rng = random.Random(4)
+    data = b''.join(rng.choice([b'alpha ', b'beta ', rng.randbytes(3)]) for _ in range(200000))
+    (tmp_path / 'big.bin').write_bytes(data)
+    archive = tmp_path / 'out.zip'
+
+    write_zip(archive, [tmp_path / 'big.bin'], compression_level=6, workers=4)
+
+    assert read_all(archive)['big.bin'] == data
+    with zipfile.ZipFile(archive) as zf:
+        # Chunks reuse the previous 32 KiB as dictionary, so the ratio holds up
+        assert zf.getinfo('big.bin').compress_size < len(zlib.compress(data, 6)) * 1.05
+
+
+def test_level_zero_stores_members(tmp_path):
+    make_tree(tmp_path)
+    archive = tmp_path / 'out.zip'
+
+    write_zip(archive, [tmp_path / 'docs'], compression_level=0)
+
+    with zipfile.ZipFile(archive) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+    assert read_all(archive)['docs/readme.txt'] == b'read me ' * 500
+
+
+def test_compressed_content_is_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_writer, 'CHUNK_SIZE', 64 * 1024)
+    (tmp_path / 'photo.jpg').write_text('not really a photo ' * 100)
+    (tmp_path / 'image').write_bytes(b'\x89PNG\r\n\x1a\n' + b'\0' * 5000)
+    (tmp_path / 'noise.bin').write_bytes(os.urandom(5000))
+    (tmp_path / 'big-noise.bin').write_bytes(os.urandom(200 * 1024))
+    (tmp_path / 'text.txt').write_text('plain text ' * 500)
+    archive = tmp_path / 'out.zip'
+
+    write_zip(archive, [tmp_path / name for name in
+                        ('photo.jpg', 'image', 'noise.bin', 'big-noise.bin', 'text.txt')], workers=2)
+
+    with zipfile.ZipFile(archive) as zf:
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+    assert methods == {
+        'photo.jpg': zipfile.ZIP_STORED, 'image': zipfile.ZIP_STORED,
+        'noise.bin': zipfile.ZIP_STORED, 'big-noise.bin': zipfile.ZIP_STORED,
+        'text.txt': zipfile.ZIP_DEFLATED,
+    }
+    assert read_all(archive)['big-noise.bin'] == (tmp_path / 'big-noise.bin').read_bytes()
+
+
+def test_zip64_records(tmp_path, monkeypatch):
+    # Lower the limits so small inputs need every ZIP64 structure
+    monkeypatch.setattr(zip_writer, 'ZIP64_LIMIT', 1000)
+    monkeypatch.setattr(zip_writer, 'ZIP_FILECOUNT_LIMIT', 5)
+    monkeypatch.setattr(zip_writer, 'CHUNK_SIZE', 4096)
+    folder = tmp_path / 'many'
+    folder.mkdir()
+    for i in range(8):
+        (folder / f'{i}.bin').write_bytes(os.urandom(1500 * i))
+    archive = tmp_path / 'out.zip'
+
+    write_zip(archive, [folder])
+
+    contents = read_all(archive)
+    assert len(contents) == 9
+    assert contents['many/7.bin'] == (folder / '7.bin').read_bytes()
+    listing = list_zip(archive)
+    with zipfile.ZipFile(archive) as zf:
+        assert list(listing.header_offsets) == [info.header_offset for info in zf.infolist()]
+        assert list(listing.sizes) == [info.file_size for info in zf.infolist()]
+
+
+def test_archive_inside_its_own_input_folder(tmp_path):
+    make_tree(tmp_path)
+    archive = tmp_path / 'docs' / 'self.zip'
+
+    write_zip(archive, [tmp_path / 'docs'])
+
+    assert not any(name.endswith('.tmp') for name in read_all(archive))
+    assert [path.name for path in (tmp_path / 'docs').iterdir() if path.suffix == '.tmp'] == []
+
+
+def test_failed_write_leaves_no_archive(tmp_path):
+    archive = tmp_path / 'out.zip'
+
+    with pytest.raises(OSError):
+        write_zip(archive, [tmp_path / 'missing'])
+    with pytest.raises(ValueError):
+        write_zip(archive, [tmp_path], compression_level=12)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cancelled_write_leaves_no_archive(tmp_path):
+    make_tree(tmp_path)
+    archive = tmp_path / 'out.zip'
+    token = CancelToken()
+    token.cancel()
+
+    with pytest.raises(JobCancelled):
+        write_zip(archive, [tmp_path / 'docs'], cancel=token)
+    assert sorted(os.listdir(tmp_path)) == ['docs', 'single.bin']
@@ -0,0 +1,266 @@
+"""
+Single instance support for HRNZipper
+Lets later launches hand their command line to an already running instance
+
+The endpoint lives in a per-user private directory, together with a random
+key that both sides must prove they know. Messages are JSON, never pickles.
+On POSIX the first process holds an exclusive lock on the directory for its
+lifetime, on Windows the pipe name carries a random per-user suffix.
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import logging
+import secrets
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+KEY_SIZE = 32
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+def get_instance_dir(directory=None):
+    """Create and return the private directory holding the instance endpoint
+    
+    Raises OSError if the directory is not owned by the current user or can
+    be accessed by others.
+    """
+    if directory is None:
+        if sys.platform == 'win32':
+            base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+            directory = os.path.join(base, 'HRNZipper', 'instance')
+        elif os.environ.get('XDG_RUNTIME_DIR'):
+            directory = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'hrnzipper')
+        else:
+            directory = os.path.join(tempfile.gettempdir(), f'hrnzipper-{os.getuid()}')
+    
+    try:
+        os.makedirs(directory, mode=0o700)
+    except FileExistsError:
+        pass
+    
+    if sys.platform != 'win32':
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+            raise OSError(f"Instance directory is not owned by this user: {directory}")
+        if info.st_mode & 0o077:
+            raise OSError(f"Instance directory is accessible by other users: {directory}")
+    return directory
+
+def _read_key(directory):
+    """Return the random per-user key, creating it on first use"""
+    path = os.path.join(directory, 'instance.key')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(KEY_SIZE))
+    
+    # Another process may have created the file and still be writing it
+    for _ in range(50):
+        if sys.platform != 'win32':
+            info = os.lstat(path)
+            if info.st_uid != os.getuid() or info.st_mode & 0o077:
+                raise OSError(f"Instance key has unsafe ownership or permissions: {path}")
+        with open(path, 'rb') as f:
+            key = f.read()
+        if len(key) == KEY_SIZE:
+            return key
+        time.sleep(0.01)
+    raise OSError(f"Instance key is invalid: {path}")
+
+def _get_address(directory, key):
+    if sys.platform == 'win32':
+        # The key-derived suffix keeps other users from squatting the pipe name
+        return rf'\\.\pipe\HRNZipper-{key[:16].hex()}'
+    return os.path.join(directory, 'instance.sock')
+
+def _check_socket(address):
+    """Refuse to talk to a socket another user created"""
+    if sys.platform == 'win32':
+        return True
+    try:
+        info = os.lstat(address)
+    except FileNotFoundError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+def _send(address, key, payload):
+    if not _check_socket(address):
+        return False
+    try:
+        with Client(address, authkey=key) as conn:
+            conn.send_bytes(json.dumps(payload).encode('utf-8'))
+            return conn.recv_bytes(16) == b'ok'
+    except (OSError, EOFError, AuthenticationError):
+        return False
+
+def forward_to_instance(argv, directory=None, timeout=0):
+    """Send a command line to the running instance
+    
+    Keeps retrying for ``timeout`` seconds, to cover an instance that owns the
+    endpoint but is still starting to listen. Returns True if an instance
+    accepted the command line, False if none is running.
+    """
+    try:
+        directory = get_instance_dir(directory)
+        key = _read_key(directory)
+    except OSError as e:
+        logger.warning(f"Single instance support disabled: {e}")
+        return False
+    
+    address = _get_address(directory, key)
+    payload = {'argv': list(argv), 'cwd': os.getcwd()}
+    deadline = time.monotonic() + timeout
+    while True:
+        if _send(address, key, payload):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+
+class InstanceServer:
+    """Accept command lines forwarded by later HRNZipper launches
+    
+    The server can be started before the GUI exists. Payloads received before
+    ``set_handler()`` is called are buffered and delivered in order. The
+    handler is called from the server thread with a dict holding the
+    forwarded ``argv`` and the ``cwd`` it was started from.
+    """
+    
+    def __init__(self, handler=None, directory=None):
+        self.directory = directory
+        self._handler = handler
+        self._pending = []
+        self._lock = threading.Lock()
+        self._key = None
+        self._address = None
+        self._lock_file = None
+        self._listener = None
+        self._thread = None
+        self._stopping = False
+    
+    def start(self):
+        """Start listening, returns False if another instance owns the endpoint"""
+        try:
+            self.directory = get_instance_dir(self.directory)
+            self._key = _read_key(self.directory)
+        except OSError as e:
+            logger.warning(f"Single instance support disabled: {e}")
+            return False
+        self._address = _get_address(self.directory, self._key)
+        
+        if sys.platform != 'win32' and not self._acquire_lock():
+            return False
+        
+        try:
+            # On Windows creating the first pipe instance fails if it exists
+            self._listener = Listener(self._address, authkey=self._key)
+        except OSError as e:
+            logger.warning(f"Could not listen for other instances: {e}")
+            self._release_lock()
+            return False
+        
+        self._thread = threading.Thread(target=self._serve, name='InstanceServer', daemon=True)
+        self._thread.start()
+        return True
+    
+    def _acquire_lock(self):
+        import fcntl
+        
+        try:
+            self._lock_file = open(os.path.join(self.directory, 'instance.lock'), 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Another instance holds the lock, or the lock file cannot be opened
+            self._release_lock()
+            return False
+        
+        # Holding the lock means any socket left behind belongs to a crashed process
+        try:
+            if os.path.lexists(self._address):
+                os.unlink(self._address)
+        except OSError as e:
+            logger.warning(f"Could not remove stale instance socket: {e}")
+            self._release_lock()
+            return False
+        return True
+    
+    def _release_lock(self):
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def set_handler(self, handler):
+        """Deliver buffered and future command lines to the handler"""
+        with self._lock:
+            self._handler = handler
+            pending, self._pending = self._pending, []
+            for payload in pending:
+                self._deliver(payload)
+    
+    def stop(self):
+        """Stop listening and release the endpoint"""
+        if not self._listener:
+            return
+        self._stopping = True
+        
+        # Wake the blocking accept() so the thread can exit
+        _send(self._address, self._key, {'stop': True})
+        self._thread.join(timeout=2)
+        self._listener.close()
+        self._listener = None
+        self._release_lock()
+    
+    def _deliver(self, payload):
+        try:
+            self._handler(payload)
+        except Exception as e:
+            logger.error(f"Failed to handle forwarded command: {e}")
+    
+    def _serve(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                if self._stopping:
+                    break
+                logger.warning(f"Rejected instance connection: {e}")
+                continue
+            
+            with conn:
+                try:
+                    payload = json.loads(conn.recv_bytes(MAX_MESSAGE_SIZE))
+                    conn.send_bytes(b'ok')
+                except (OSError, EOFError, ValueError) as e:
+                    logger.warning(f"Failed to receive forwarded command: {e}")
+                    continue
+            
+            if not isinstance(payload, dict):
+                continue
+            if self._stopping:
+                if payload.get('stop'):
+                    break
+                continue
+            if 'stop' in payload:
+                continue
+            
+            argv = payload.get('argv')
+            cwd = payload.get('cwd')
+            if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                continue
+            if not isinstance(cwd, str):
+                continue
+            
+            with self._lock:
+                if self._handler is None:
+                    self._pending.append({'argv': argv, 'cwd': cwd})
+                else:
+                    self._deliver({'argv': argv, 'cwd': cwd})